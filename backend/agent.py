@@ -1,22 +1,41 @@
 import os
+import math
+import mmap
 import time
-import json
 import uuid
 import queue
+import struct
 import psutil
 import random
-import signal
 import socket
-import threading
+import itertools
+import asyncio
+import signal
 import logging
-from logging.handlers import RotatingFileHandler
-from typing import Any, Dict, Optional
+import threading
+import contextlib
+from email.utils import parsedate_to_datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 
-import requests
+import httpx
+import orjson
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import uvicorn
 
+# Optional fast event loop / HTTP parser (bundled with uvicorn[standard] on Linux/macOS)
+try:
+    import uvloop  # type: ignore
+except Exception:
+    uvloop = None
+
+try:
+    import httptools  # type: ignore  # noqa: F401
+    HAVE_HTTPTOOLS = True
+except Exception:
+    HAVE_HTTPTOOLS = False
+
 # ----------------------------
 # Configuration
 # ----------------------------
@@ -27,21 +46,38 @@ class Settings:
     REPORT_INTERVAL: float = float(os.getenv("REPORT_INTERVAL", "5"))       # seconds
     EVENT_INTERVAL: float = float(os.getenv("EVENT_INTERVAL", "15"))        # seconds
     PEER_PORT: int = int(os.getenv("PEER_PORT", "9001"))
+    TOP_PROCESS_TTL: float = float(os.getenv("TOP_PROCESS_TTL", "15"))      # seconds between process scans
 
     # Dashboard endpoints (must be reachable inside air-gapped network)
     DASHBOARD_URL: str = os.getenv("DASHBOARD_URL", "http://127.0.0.1:8000/api/report")
     EVENT_URL: str = os.getenv("EVENT_URL", "http://127.0.0.1:8000/api/event")
+    # Report + event in one POST when both are due on the same tick
+    TELEMETRY_URL: str = os.getenv("TELEMETRY_URL", "http://127.0.0.1:8000/api/telemetry")
+    COALESCE_TELEMETRY: bool = os.getenv("COALESCE_TELEMETRY", "true").lower() == "true"
 
     # HTTP client and security
     REQUEST_TIMEOUT: float = float(os.getenv("REQUEST_TIMEOUT", "3"))
     VERIFY_TLS: bool = os.getenv("VERIFY_TLS", "false").lower() == "true"   # default false for local/dev
     MAX_RETRIES: int = int(os.getenv("MAX_RETRIES", "3"))
     BACKOFF_SECONDS: float = float(os.getenv("BACKOFF_SECONDS", "1.0"))
+    BACKOFF_MAX: float = float(os.getenv("BACKOFF_MAX", "30"))
+    HTTP_POOL_SIZE: int = int(os.getenv("HTTP_POOL_SIZE", "32"))
+    # Keep idle connections past the longest send interval so every tick reuses one.
+    HTTP_KEEPALIVE_EXPIRY: float = float(
+        os.getenv("HTTP_KEEPALIVE_EXPIRY", str(2 * max(REPORT_INTERVAL, EVENT_INTERVAL)))
+    )
 
     # Offline buffering (for air-gapped / intermittent connectivity)
     DATA_DIR: str = os.getenv("DATA_DIR", os.path.join(os.path.dirname(__file__), "data"))
-    BUFFER_FILE: str = os.getenv("BUFFER_FILE", "event_buffer.jsonl")
+    BUFFER_FILE: str = os.getenv("BUFFER_FILE", "event_buffer.jsonl")       # legacy JSONL, imported on startup
+    BUFFER_RING_FILE: str = os.getenv("BUFFER_RING_FILE", "event_buffer.ring")
+    BUFFER_RING_SIZE: int = int(os.getenv("BUFFER_RING_SIZE", str(64 * 1024 * 1024)))  # bytes
+    BUFFER_WRITE_BATCH: int = int(os.getenv("BUFFER_WRITE_BATCH", "256"))  # records per ring write
+    BUFFER_SYNC_EVERY: int = int(os.getenv("BUFFER_SYNC_EVERY", "1"))      # ring writes between msyncs
     FLUSH_INTERVAL: float = float(os.getenv("FLUSH_INTERVAL", "10"))
+    FLUSH_INTERVAL_MAX: float = float(os.getenv("FLUSH_INTERVAL_MAX", "120"))  # backoff ceiling while offline
+    FLUSH_BATCH_SIZE: int = int(os.getenv("FLUSH_BATCH_SIZE", "500"))        # records per bulk POST
+    SHUTDOWN_TIMEOUT: float = float(os.getenv("SHUTDOWN_TIMEOUT", "10"))     # per step: task stop, final flush
 
     # Baseline policy (can be customized via env JSON)
     BASELINE_JSON: Optional[str] = os.getenv("BASELINE_JSON")
@@ -50,6 +86,10 @@ class Settings:
     def buffer_path(self) -> str:
         return os.path.join(self.DATA_DIR, self.BUFFER_FILE)
 
+    @property
+    def ring_path(self) -> str:
+        return os.path.join(self.DATA_DIR, self.BUFFER_RING_FILE)
+
 SETTINGS = Settings()
 
 # ----------------------------
@@ -67,27 +107,64 @@ log_formatter = logging.Formatter(
     "%(asctime)s | %(levelname)s | %(threadName)s | %(name)s | %(message)s"
 )
 log_handler.setFormatter(log_formatter)
-logger.addHandler(log_handler)
 
 # Also log to console for dev
 console = logging.StreamHandler()
 console.setFormatter(log_formatter)
-logger.addHandler(console)
+
+# Callers only enqueue records; formatting, rotation and stdout writes happen
+# on the listener thread so the loops never block on log I/O.
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(log_queue))
+log_listener = QueueListener(log_queue, log_handler, console, respect_handler_level=True)
+log_listener.start()
 
 # ----------------------------
-# HTTP session (no external proxies; ideal for air-gapped)
+# HTTP client (no external proxies; ideal for air-gapped)
 # ----------------------------
 
-session = requests.Session()
-session.trust_env = False  # ignore system proxies to avoid accidental egress
+# Shared by every loop; created on startup so it binds to the running event loop.
+client: Optional[httpx.AsyncClient] = None
+
+async def prewarm_client() -> None:
+    """
+    Opens the dashboard connection before the first report needs it.
+    Any HTTP status will do; only the handshake matters.
+    """
+    try:
+        await client.head(SETTINGS.DASHBOARD_URL, timeout=1)
+    except Exception as e:
+        logger.debug("Connection pre-warm failed: %s", e)
+
+def create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        verify=SETTINGS.VERIFY_TLS,
+        timeout=SETTINGS.REQUEST_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=SETTINGS.HTTP_POOL_SIZE,
+            max_keepalive_connections=SETTINGS.HTTP_POOL_SIZE,
+            keepalive_expiry=SETTINGS.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        trust_env=False,  # ignore system proxies to avoid accidental egress
+    )
 
 # ----------------------------
 # State and synchronization
 # ----------------------------
 
 current_metrics: Dict[str, Any] = {}
-stop_event = threading.Event()
-buffer_lock = threading.Lock()
+# /status body, re-encoded only when current_metrics changes
+status_body: bytes = orjson.dumps({"status": "initializing"})
+# Latest sample from metrics_sampler_loop. Readers take the reference; the
+# sampler swaps in a new dict instead of mutating, so snapshots stay consistent.
+latest_metrics: Dict[str, Any] = {}
+metrics_ready = asyncio.Event()
+buffer_ring: Optional["RingBuffer"] = None
+buffer_queue: "queue.SimpleQueue[Optional[bytes]]" = queue.SimpleQueue()
+buffer_writer_thread: Optional[threading.Thread] = None
+stop_event = asyncio.Event()
+background_tasks: List[asyncio.Task] = []
 os.makedirs(SETTINGS.DATA_DIR, exist_ok=True)
 
 # ----------------------------
@@ -97,7 +174,7 @@ os.makedirs(SETTINGS.DATA_DIR, exist_ok=True)
 def load_baseline() -> Dict[str, Any]:
     if SETTINGS.BASELINE_JSON:
         try:
-            return json.loads(SETTINGS.BASELINE_JSON)
+            return orjson.loads(SETTINGS.BASELINE_JSON)
         except Exception as e:
             logger.warning("Invalid BASELINE_JSON: %s", e)
     # Default baseline
@@ -108,31 +185,74 @@ def load_baseline() -> Dict[str, Any]:
         "allowed_memory": 95,
     }
 
-BASELINE = load_baseline()
+# agent_id and baseline never change, so the event envelope is encoded once;
+# the trailing "}" is dropped so each event can be spliced in as bytes.
+_STATIC_ENVELOPE = {"agent_id": SETTINGS.AGENT_ID, "baseline": load_baseline()}
+_STATIC_ENVELOPE_BYTES = orjson.dumps(_STATIC_ENVELOPE)[:-1]
 
-def collect_metrics() -> Dict[str, Any]:
-    cpu_usage = psutil.cpu_percent(interval=0.5)
-    memory_info = psutil.virtual_memory()
-    disk_usage = psutil.disk_usage('/').percent
+JSON_HEADERS = {"content-type": "application/json"}
+
+_TELEMETRY_PREFIX = b'{"agent_id":' + orjson.dumps(SETTINGS.AGENT_ID) + b',"report":'
+
+def build_event_body(event_payload: Dict[str, Any]) -> bytes:
+    return _STATIC_ENVELOPE_BYTES + b',"event":' + orjson.dumps(event_payload) + b'}'
 
-    # Safely compute top process by CPU
-    processes = []
-    for p in psutil.process_iter(['name', 'cpu_percent']):
+def build_report_body(metrics: Dict[str, Any]) -> bytes:
+    return orjson.dumps({"agent_id": SETTINGS.AGENT_ID, **metrics})
+
+def build_telemetry_body(report_body: bytes, event_body: bytes) -> bytes:
+    return _TELEMETRY_PREFIX + report_body + b',"event":' + event_body + b'}'
+
+# Prime the non-blocking sampler: later cpu_percent(interval=None) calls
+# report usage since the previous call instead of sleeping to measure it.
+psutil.cpu_percent(interval=None)
+
+# Simulation randomness: a byte table indexed by a shared counter instead of
+# a Mersenne Twister call per tick.
+_RAND_TABLE = os.urandom(1024)
+_rand_counter = itertools.count()
+
+def _rand_byte() -> int:
+    return _RAND_TABLE[next(_rand_counter) & 1023]
+
+_last_top_scan_ts = 0.0
+_last_top_process = ("unknown", 0.0)
+
+def top_cpu_process() -> tuple:
+    """
+    (name, cpu_percent) of the busiest process, rescanned every TOP_PROCESS_TTL.
+    """
+    global _last_top_scan_ts, _last_top_process
+    now = time.monotonic()
+    if _last_top_scan_ts and now - _last_top_scan_ts < SETTINGS.TOP_PROCESS_TTL:
+        return _last_top_process
+
+    # Running max; avoids materializing a tuple per process
+    top = None
+    for p in psutil.process_iter(attrs=['name', 'cpu_percent']):
         try:
             info = p.info
-            name = info.get('name') or "unknown"
-            cpu_p = info.get('cpu_percent') or 0.0
-            processes.append((name, cpu_p))
+            c = info.get('cpu_percent') or 0.0
+            if top is None or c > top[1]:
+                top = (info.get('name') or "unknown", c)
         except Exception:
             continue
-    top_process = max(processes, key=lambda x: x[1], default=("unknown", 0.0))
+    _last_top_scan_ts, _last_top_process = now, top or ("unknown", 0.0)
+    return _last_top_process
+
+def collect_metrics() -> Dict[str, Any]:
+    cpu_usage = psutil.cpu_percent(interval=None)
+    memory_info = psutil.virtual_memory()
+    disk_usage = psutil.disk_usage('/').percent
+
+    top_process = top_cpu_process()
 
     net_io = psutil.net_io_counters()
     network_sent = net_io.bytes_sent
     network_recv = net_io.bytes_recv
 
     # Simulated workload proxy
-    workload = random.randint(30, 95)
+    workload = 30 + _rand_byte() * 65 // 255
 
     return {
         "cpu": float(cpu_usage),
@@ -143,176 +263,620 @@ def collect_metrics() -> Dict[str, Any]:
         "network_sent": int(network_sent),
         "network_recv": int(network_recv),
         "workload": int(workload),
-        "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "timestamp": time.time_ns() // 1_000_000,  # epoch ms
     }
 
-def safe_post_json(url: str, payload: Dict[str, Any]) -> bool:
+async def wait_stop(timeout: float) -> bool:
+    """
+    Stop-aware sleep. Returns True once shutdown has been requested.
+    """
+    try:
+        await asyncio.wait_for(stop_event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    return stop_event.is_set()
+
+def next_deadline(deadline: float, period: float) -> Tuple[float, int]:
     """
-    Attempts to POST JSON with limited retries and backoff.
-    Returns True if sent; False if failed (caller may buffer offline).
+    Advances a monotonic deadline by whole periods until it is in the future,
+    so missed ticks are skipped instead of drifting or firing in a burst.
+    Returns the new deadline and how many periods it moved.
     """
+    behind = time.monotonic() - deadline
+    ticks = 1 if behind < 0 else 1 + int(behind // period)
+    return deadline + ticks * period, ticks
+
+# 4xx statuses worth retrying; any other 4xx means the payload will never be accepted.
+RETRYABLE_CLIENT_STATUS = (408, 429)
+
+def retry_after_seconds(resp: httpx.Response) -> Optional[float]:
+    """
+    Parses a Retry-After header given either as seconds or as an HTTP date.
+    """
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+async def post_with_retries(
+    url: str,
+    payload: Union[Dict[str, Any], bytes, Callable[[], AsyncIterator[bytes]]],
+    passthrough: tuple = (),
+) -> Optional[httpx.Response]:
+    """
+    Attempts to POST JSON (a dict, an already-encoded body, or a factory
+    returning a fresh streamed body per attempt) with limited retries and
+    exponential backoff with decorrelated jitter, honoring Retry-After.
+    Returns the response on success, or immediately (without retrying) when
+    the status is listed in `passthrough` or is a permanent rejection (4xx
+    other than 408/429), so callers don't buffer a payload the dashboard will
+    never accept. Returns None once retries are exhausted.
+    """
+    streamed = callable(payload)
+    body = None if streamed else payload if isinstance(payload, bytes) else orjson.dumps(payload)
+    delay = SETTINGS.BACKOFF_SECONDS
     for attempt in range(1, SETTINGS.MAX_RETRIES + 1):
+        resp = None
         try:
-            resp = session.post(
-                url,
-                json=payload,
-                timeout=SETTINGS.REQUEST_TIMEOUT,
-                verify=SETTINGS.VERIFY_TLS,
-            )
+            content = payload() if streamed else body
+            resp = await client.post(url, content=content, headers=JSON_HEADERS, timeout=SETTINGS.REQUEST_TIMEOUT)
+            if resp.status_code in passthrough:
+                return resp
+            if 400 <= resp.status_code < 500 and resp.status_code not in RETRYABLE_CLIENT_STATUS:
+                logger.error("POST to %s rejected with %d; dropping payload.", url, resp.status_code)
+                return resp
             resp.raise_for_status()
-            return True
+            return resp
         except Exception as e:
             logger.warning("POST attempt %d to %s failed: %s", attempt, url, e)
-            if attempt < SETTINGS.MAX_RETRIES:
-                time.sleep(SETTINGS.BACKOFF_SECONDS * attempt)
-    return False
+        if attempt == SETTINGS.MAX_RETRIES:
+            break
 
-def buffer_event(record: Dict[str, Any]) -> None:
-    try:
-        with buffer_lock, open(SETTINGS.buffer_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(record) + "\n")
-    except Exception as e:
-        logger.error("Failed to buffer event: %s", e)
+        # Decorrelated jitter keeps recovering agents from retrying in lock-step
+        delay = min(SETTINGS.BACKOFF_MAX, random.uniform(SETTINGS.BACKOFF_SECONDS, delay * 3))
+        retry_after = retry_after_seconds(resp) if resp is not None else None
+        if retry_after is not None:
+            if retry_after > SETTINGS.BACKOFF_MAX:
+                break  # server wants a long pause; leave it to the buffer flusher
+            delay = max(delay, retry_after)
+        if await wait_stop(delay):
+            break
+    return None
 
-def flush_buffered_events() -> None:
-    tmp_path = SETTINGS.buffer_path + ".tmp"
-    try:
-        with buffer_lock:
-            if not os.path.exists(SETTINGS.buffer_path):
-                return
-            # Move to tmp to avoid rewriting while flushing
-            os.replace(SETTINGS.buffer_path, tmp_path)
+async def safe_post_json(url: str, payload: Union[Dict[str, Any], bytes]) -> bool:
+    """
+    Returns True if sent (or permanently rejected); False if failed
+    (caller may buffer offline).
+    """
+    return await post_with_retries(url, payload) is not None
+
+# Dashboard replies that mean "send these one at a time instead":
+# 404 (dashboard predates the batch routes), 413 (too large), 415 (unsupported).
+BATCH_FALLBACK_STATUS = (404, 413, 415)
+
+def batch_url(url: str) -> str:
+    """
+    Bulk counterpart of a dashboard endpoint, e.g. /api/report -> /api/report_batch.
+    """
+    return url.rstrip("/") + "_batch"
+
+_BATCH_PREFIX = b'{"agent_id":' + orjson.dumps(SETTINGS.AGENT_ID) + b',"batch":['
+
+async def safe_post_json_batch(url: str, payloads: List[bytes]) -> List[bytes]:
+    """
+    Sends encoded payloads destined for `url` in one POST to its batch endpoint:
+        {"agent_id": "<id>", "batch": [<payload>, ...]}
+    Falls back to per-item POSTs if the dashboard rejects the batch.
+    Returns the payloads that could not be delivered (empty when all were sent).
+    """
+    body = _BATCH_PREFIX + b",".join(payloads) + b"]}"
+    resp = await post_with_retries(batch_url(url), body, passthrough=BATCH_FALLBACK_STATUS)
+    if resp is None:
+        return payloads
+    if resp.status_code not in BATCH_FALLBACK_STATUS:
+        return []
+
+    logger.info("Batch endpoint for %s rejected (%d); sending individually.", url, resp.status_code)
+    unsent = []
+    for data in payloads:
+        if not await safe_post_json(url, data):
+            unsent.append(data)
+    return unsent
+
+class RingBuffer:
+    """
+    Fixed-size, mmap-backed FIFO for the offline buffer.
+
+    Layout: a 16-byte header holding head/tail (little-endian uint64 offsets into
+    the data region), followed by the data region. Each record is a uint32
+    length prefix plus its bytes, wrapping at the end of the region. head == tail
+    means empty; one byte always stays free so a full ring never looks empty.
+
+    Appending is a memcpy plus a tail update; the kernel writes dirty pages back,
+    so records survive an agent crash. Single producer / single consumer: only
+    the buffer writer thread appends (moving tail) and only the flusher consumes
+    (moving head). Each side stores just its own offset and reads the other's
+    as a plain int, which is atomic under the GIL, so there is no lock.
+    """
+
+    HEADER = struct.Struct("<QQ")
+    OFFSET = struct.Struct("<Q")
+    LENGTH = struct.Struct("<I")
+
+    def __init__(self, path: str, size: int):
+        self.capacity = size - self.HEADER.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fresh = os.fstat(fd).st_size != size
+            if fresh:
+                if os.fstat(fd).st_size:
+                    logger.warning("Offline buffer %s has a different size; starting empty.", path)
+                os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.head, self.tail = (0, 0) if fresh else self.HEADER.unpack_from(self._mm, 0)
+        if self.head >= self.capacity or self.tail >= self.capacity:
+            logger.warning("Offline buffer header is corrupt; starting empty.")
+            self.head = self.tail = 0
+        self.HEADER.pack_into(self._mm, 0, self.head, self.tail)
+        self._synced_tail = self.tail
 
-        # Re-send each buffered line
-        sent_all = True
-        with open(tmp_path, "r", encoding="utf-8") as f:
+    @property
+    def used(self) -> int:
+        return (self.tail - self.head) % self.capacity
+
+    def __bool__(self) -> bool:
+        return self.head != self.tail
+
+    def _write(self, offset: int, data: bytes) -> int:
+        first = min(len(data), self.capacity - offset)
+        base = self.HEADER.size
+        self._mm[base + offset: base + offset + first] = data[:first]
+        if first < len(data):
+            self._mm[base: base + len(data) - first] = data[first:]
+        return (offset + len(data)) % self.capacity
+
+    def _read(self, offset: int, n: int) -> Tuple[bytes, int]:
+        first = min(n, self.capacity - offset)
+        base = self.HEADER.size
+        data = self._mm[base + offset: base + offset + first]
+        if first < n:
+            data += self._mm[base: base + n - first]
+        return data, (offset + n) % self.capacity
+
+    def append(self, record: bytes) -> bool:
+        """
+        Returns False (and drops the record) when the ring is full.
+        """
+        return self.extend([record]) == 1
+
+    def extend(self, records: List[bytes]) -> int:
+        """
+        Appends as many records as fit with a single copy and tail update.
+        Returns how many were written; the rest are dropped.
+        """
+        free = self.capacity - 1 - self.used
+        frames = []
+        for record in records:
+            need = self.LENGTH.size + len(record)
+            if need > free:
+                break
+            frames.append(self.LENGTH.pack(len(record)))
+            frames.append(record)
+            free -= need
+        if frames:
+            self.tail = self._write(self.tail, b"".join(frames))
+            self.OFFSET.pack_into(self._mm, 8, self.tail)
+        return len(frames) // 2
+
+    def records(self, end: int) -> Iterator[Tuple[int, bytes]]:
+        """
+        Yields (offset after record, record) from head up to `end`. A length
+        prefix running past `end` means the ring is corrupt (e.g. a torn
+        write); the rest of the range cannot be framed, so head is moved to
+        `end` and iteration stops.
+        """
+        offset = self.head
+        total = remaining = (end - offset) % self.capacity
+        while remaining:
+            n = None
+            if remaining >= self.LENGTH.size:
+                raw_len, offset = self._read(offset, self.LENGTH.size)
+                n = self.LENGTH.unpack(raw_len)[0]
+            if n is None or self.LENGTH.size + n > remaining:
+                logger.error("Offline buffer is corrupt; dropping %d buffered bytes.", total)
+                self.consume(end)
+                return
+            data, offset = self._read(offset, n)
+            remaining -= self.LENGTH.size + n
+            yield offset, data
+
+    def consume(self, offset: int) -> None:
+        self.head = offset
+        self.OFFSET.pack_into(self._mm, 0, self.head)
+
+    def _flush_range(self, start: int, end: int) -> None:
+        # msync needs a page-aligned start; offsets here are file offsets.
+        aligned = start - start % mmap.PAGESIZE
+        self._mm.flush(aligned, end - aligned)
+
+    def sync(self) -> None:
+        """
+        Flushes only the pages written since the last sync (plus the header),
+        so a batch costs one or two small msyncs instead of one over the map.
+        """
+        start, end, base = self._synced_tail, self.tail, self.HEADER.size
+        self._flush_range(0, self.HEADER.size)
+        if end >= start:
+            if end > start:
+                self._flush_range(base + start, base + end)
+        else:
+            self._flush_range(base + start, base + self.capacity)
+            if end:
+                self._flush_range(base, base + end)
+        self._synced_tail = end
+
+    def close(self) -> None:
+        self._mm.flush()
+        self._mm.close()
+
+def encode_record(url: str, data: bytes) -> bytes:
+    # Ring records are "<url>\n<json body>"; orjson never emits a raw newline.
+    return url.encode() + b"\n" + data
+
+def decode_record(raw: bytes) -> Tuple[str, bytes]:
+    if raw[:1] == b"{":
+        # {"_url": ..., "_data": ...} record written by an older agent
+        record = orjson.loads(raw)
+        return record.get("_url") or "", orjson.dumps(record.get("_data"))
+    url, _, data = raw.partition(b"\n")
+    return url.decode(), data
+
+def open_buffer_ring() -> RingBuffer:
+    ring = RingBuffer(SETTINGS.ring_path, SETTINGS.BUFFER_RING_SIZE)
+    # Carry over anything left in the JSONL buffer used by older agents.
+    for legacy in (SETTINGS.buffer_path, SETTINGS.buffer_path + ".tmp"):
+        if not os.path.exists(legacy):
+            continue
+        with open(legacy, "rb") as f:
             for line in f:
                 line = line.strip()
                 if not line:
                     continue
                 try:
-                    record = json.loads(line)
+                    url, data = decode_record(line)
                 except Exception:
                     continue
-                url = record.get("_url")
-                data = record.get("_data")
-                if not url or data is None:
-                    continue
-                if not safe_post_json(url, data):
-                    # If any fail, re-buffer and mark failure
-                    buffer_event(record)
-                    sent_all = False
-        # Cleanup tmp if everything sent
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
-        if sent_all:
-            logger.info("Buffered events flushed successfully.")
-        else:
-            logger.info("Buffered events partially flushed; remaining kept in buffer.")
-    except FileNotFoundError:
-        # Nothing to flush
-        pass
+                if not ring.append(encode_record(url, data)):
+                    logger.error("Offline buffer full while importing %s.", legacy)
+                    break
+        os.remove(legacy)
+        logger.info("Imported legacy offline buffer %s.", legacy)
+    return ring
+
+def buffer_writer() -> None:
+    """
+    Sole writer of the ring: drains queued records in batches so producers never
+    wait on the ring. A None in the queue stops the thread.
+    """
+    logger.info("Buffer writer started.")
+    writes = 0
+    while True:
+        batch = [buffer_queue.get()]
+        while batch[-1] is not None and len(batch) < SETTINGS.BUFFER_WRITE_BATCH:
+            try:
+                batch.append(buffer_queue.get_nowait())
+            except queue.Empty:
+                break
+        stopping = batch[-1] is None
+        records = batch[:-1] if stopping else batch
+        try:
+            dropped = len(records) - buffer_ring.extend(records)
+            if dropped:
+                logger.error("Offline buffer full; dropped %d events.", dropped)
+            writes += 1
+            if writes % SETTINGS.BUFFER_SYNC_EVERY == 0:
+                buffer_ring.sync()
+        except Exception as e:
+            logger.error("Failed to buffer events: %s", e)
+        if stopping:
+            return
+
+def buffer_event(url: str, data: Union[Dict[str, Any], bytes]) -> None:
+    try:
+        body = data if isinstance(data, bytes) else orjson.dumps(data)
+        buffer_queue.put_nowait(encode_record(url, body))
     except Exception as e:
-        logger.error("Error flushing buffer: %s", e)
-        # If tmp still exists, merge back
+        logger.error("Failed to buffer event: %s", e)
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Ring offset each destination has already been delivered up to. The head only
+# moves once every destination in a range is delivered, so without this a URL
+# that succeeded would be re-sent while another one is still failing. Cleared
+# whenever the head moves.
+_delivered_through: Dict[str, int] = {}
+
+def buffered_urls(end: int) -> Set[str]:
+    """
+    Destinations with records between the ring head and `end`; records that do
+    not decode are skipped (and dropped once the range is consumed).
+    """
+    urls = set()
+    for _, raw in buffer_ring.records(end):
         try:
-            if os.path.exists(tmp_path):
-                with open(tmp_path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        try:
-                            record = json.loads(line)
-                            buffer_event(record)
-                        except Exception:
-                            continue
-                os.remove(tmp_path)
+            urls.add(decode_record(raw)[0])
         except Exception:
-            pass
+            continue
+    urls.discard("")
+    return urls
+
+def buffered_payloads(url: str, end: int) -> Iterator[bytes]:
+    """
+    Encoded payloads for `url` between the ring head (or where `url` was last
+    delivered up to) and `end`.
+    """
+    skip_to = _delivered_through.get(url)
+    for offset, raw in buffer_ring.records(end):
+        if skip_to is not None:
+            if offset == skip_to:
+                skip_to = None
+            continue
+        try:
+            record_url, data = decode_record(raw)
+        except Exception:
+            continue
+        if record_url == url and data != b"null":
+            yield data
+
+async def stream_batch_body(url: str, end: int) -> AsyncIterator[bytes]:
+    """
+    Batch request body for `url`, read straight from the ring in ~64 KB chunks.
+    """
+    chunk = bytearray(_BATCH_PREFIX)
+    sep = b""
+    for data in buffered_payloads(url, end):
+        chunk += sep
+        chunk += data
+        sep = b","
+        if len(chunk) >= STREAM_CHUNK_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+    chunk += b"]}"
+    yield bytes(chunk)
+
+async def flush_buffered_events() -> bool:
+    """
+    Replays the offline buffer. Each destination gets one streamed (chunked)
+    POST to its batch endpoint, so memory stays bounded however long the outage
+    was. If the dashboard refuses the stream, records go out in windows of
+    FLUSH_BATCH_SIZE instead. Returns False if anything had to be kept for a
+    later attempt.
+    """
+    if not buffer_ring:
+        return True
+    # Records appended while we flush (including re-buffered failures) sit past
+    # `end` and are left for the next round.
+    end = buffer_ring.tail
+    urls = buffered_urls(end)
+    if buffer_ring.head == end:
+        # records() hit a corrupt record and dropped the range
+        _delivered_through.clear()
+        return True
+    kept = 0
+    failed = []
+    for url in urls:
+        if _delivered_through.get(url) == end:
+            continue
+        try:
+            resp = await post_with_retries(
+                batch_url(url), lambda url=url: stream_batch_body(url, end), passthrough=BATCH_FALLBACK_STATUS
+            )
+            if resp is None:
+                # Dashboard unreachable: keep this destination's records
+                failed.append(url)
+                continue
+            if resp.status_code in BATCH_FALLBACK_STATUS:
+                logger.info("Streamed batch to %s rejected (%d); sending in windows.", url, resp.status_code)
+                payloads = buffered_payloads(url, end)
+                while True:
+                    window = list(itertools.islice(payloads, SETTINGS.FLUSH_BATCH_SIZE))
+                    if not window:
+                        break
+                    for data in await safe_post_json_batch(url, window):
+                        # Re-buffer whatever did not make it
+                        buffer_event(url, data)
+                        kept += 1
+        except Exception as e:
+            logger.error("Error flushing buffer for %s: %s", url, e)
+            failed.append(url)
+            continue
+        _delivered_through[url] = end
+
+    if failed:
+        # Head stays put; destinations already delivered skip ahead next round
+        logger.info("Buffered events kept for %s; dashboard unreachable.", ", ".join(sorted(failed)))
+        return False
+
+    buffer_ring.consume(end)
+    _delivered_through.clear()
+    if not kept:
+        logger.info("Buffered events flushed successfully.")
+    else:
+        logger.info("Buffered events partially flushed; %d kept in buffer.", kept)
+    return not kept
 
 # ----------------------------
-# Threads
+# Background tasks
 # ----------------------------
 
-def tetragon_event_loop() -> None:
+async def metrics_sampler_loop() -> None:
     """
-    Simulates security/telemetry events for the anomaly detector.
+    Single psutil producer for the telemetry loop.
     """
-    logger.info("Tetragon event loop started.")
+    global latest_metrics
+    logger.info("Metrics sampler started.")
+    interval = min(SETTINGS.REPORT_INTERVAL, SETTINGS.EVENT_INTERVAL)
+    deadline = time.monotonic()
     while not stop_event.is_set():
-        metrics = collect_metrics()
-        event_payload = {
-            "cpu": metrics["cpu"],
-            "memory": metrics["memory"],
-            "disk": metrics["disk"],
-            "process": metrics["top_process"],
-            "process_cpu": metrics["top_process_cpu"],
-            "network_sent": metrics["network_sent"],
-            "network_recv": metrics["network_recv"],
-            "timestamp": metrics["timestamp"],
-        }
-
-        # Anomaly simulation to exercise detection pipeline (30% chance)
-        if random.random() < 0.3:
-            logger.info("Simulating anomalous event for testing.")
-            event_payload.update({
-                "process": "evil_process.exe",
-                "disk": 98.5,
-            })
-
-        event = {
-            "agent_id": SETTINGS.AGENT_ID,
-            "event": event_payload,
-            "baseline": BASELINE,
-        }
-
-        if not safe_post_json(SETTINGS.EVENT_URL, event):
-            buffer_event({"_url": SETTINGS.EVENT_URL, "_data": event})
-
-        # Wait with stop-aware sleep
-        if stop_event.wait(SETTINGS.EVENT_INTERVAL):
+        try:
+            latest_metrics = await asyncio.to_thread(collect_metrics)
+            metrics_ready.set()
+        except Exception as e:
+            logger.error("Metrics sampling failed: %s", e)
+        deadline, _ = next_deadline(deadline, interval)
+        if await wait_stop(deadline - time.monotonic()):
             break
 
-def report_loop() -> None:
+# Reused every tick: every key is overwritten below and the dict is encoded
+# before the next tick, so no per-event allocation is needed.
+_event_payload: Dict[str, Any] = {}
+
+def build_event_payload(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Simulates security/telemetry events for the anomaly detector.
+    """
+    event_payload = _event_payload
+    event_payload["cpu"] = metrics["cpu"]
+    event_payload["memory"] = metrics["memory"]
+    event_payload["disk"] = metrics["disk"]
+    event_payload["process"] = metrics["top_process"]
+    event_payload["process_cpu"] = metrics["top_process_cpu"]
+    event_payload["network_sent"] = metrics["network_sent"]
+    event_payload["network_recv"] = metrics["network_recv"]
+    event_payload["timestamp"] = metrics["timestamp"]
+
+    # Anomaly simulation to exercise detection pipeline (30% chance: 77/256)
+    if _rand_byte() < 77:
+        logger.info("Simulating anomalous event for testing.")
+        event_payload["process"] = "evil_process.exe"
+        event_payload["disk"] = 98.5
+    return event_payload
+
+async def send_or_buffer(url: str, body: bytes) -> None:
+    if not await safe_post_json(url, body):
+        buffer_event(url, body)
+
+_telemetry_supported = True
+
+async def send_telemetry(report_body: bytes, event_body: bytes) -> None:
+    """
+    One round trip for both payloads. Dashboards without /api/telemetry (404)
+    get the legacy endpoints from then on; failures are buffered per endpoint
+    so the flusher can replay them through the batch routes.
+    """
+    global _telemetry_supported
+    if _telemetry_supported:
+        body = build_telemetry_body(report_body, event_body)
+        resp = await post_with_retries(SETTINGS.TELEMETRY_URL, body, passthrough=(404,))
+        if resp is not None and resp.status_code != 404:
+            return
+        if resp is not None:
+            logger.info("Dashboard has no %s; using separate endpoints.", SETTINGS.TELEMETRY_URL)
+            _telemetry_supported = False
+        else:
+            buffer_event(SETTINGS.DASHBOARD_URL, report_body)
+            buffer_event(SETTINGS.EVENT_URL, event_body)
+            return
+    await send_or_buffer(SETTINGS.DASHBOARD_URL, report_body)
+    await send_or_buffer(SETTINGS.EVENT_URL, event_body)
+
+async def try_offload(metrics: Dict[str, Any]) -> None:
     """
-    Periodic system metrics reporting with simple peer offload simulation.
+    Simple peer offload simulation: if CPU is high, try a peer.
     """
-    logger.info("Report loop started.")
     peer_urls = ["http://127.0.0.1:9000/status"]  # Placeholder; can be made configurable
+    try:
+        if metrics["cpu"] > 90:
+            for url in peer_urls:
+                try:
+                    r = await client.get(url, timeout=2)
+                    r.raise_for_status()
+                    peer_status = r.json()
+                    if peer_status.get("cpu", 100) < 20:
+                        take_url = url.replace("/status", "/take_task")
+                        ok = await safe_post_json(take_url, {"from": SETTINGS.AGENT_ID})
+                        if ok:
+                            logger.info("Negotiation: Offloaded task to peer at %s", url)
+                            break
+                except Exception as e:
+                    logger.debug("Peer negotiation failed (%s): %s", url, e)
+    except Exception as e:
+        logger.debug("Offload logic error: %s", e)
 
-    while not stop_event.is_set():
-        metrics = collect_metrics()
-        current_metrics.update(metrics)
+def publish_status(metrics: Dict[str, Any]) -> None:
+    global current_metrics, status_body
+    current_metrics = metrics
+    status_body = orjson.dumps(metrics)
 
-        payload = {"agent_id": SETTINGS.AGENT_ID, **metrics}
-        if not safe_post_json(SETTINGS.DASHBOARD_URL, payload):
-            buffer_event({"_url": SETTINGS.DASHBOARD_URL, "_data": payload})
+async def telemetry_loop() -> None:
+    """
+    Periodic metrics reports and security events on one schedule. Ticks every
+    gcd(REPORT_INTERVAL, EVENT_INTERVAL) on absolute deadlines; when both are
+    due they are coalesced. Overrunning ticks are skipped, and a report/event
+    whose slot fell inside the skipped ticks fires on the next one.
+    """
+    logger.info("Telemetry loop started.")
+    report_ms = max(1, round(SETTINGS.REPORT_INTERVAL * 1000))
+    event_ms = max(1, round(SETTINGS.EVENT_INTERVAL * 1000))
+    tick_ms = math.gcd(report_ms, event_ms)
+    report_every, event_every = report_ms // tick_ms, event_ms // tick_ms
+
+    tick = tick_ms / 1000
+
+    await metrics_ready.wait()
+    n = 0
+    last_report = last_event = -1
+    deadline = time.monotonic()
+    while not stop_event.is_set():
+        metrics = latest_metrics
+        report_slot, event_slot = n // report_every, n // event_every
+        report_due, event_due = report_slot != last_report, event_slot != last_event
+        last_report, last_event = report_slot, event_slot
+
+        report_body = event_body = None
+        if report_due:
+            publish_status(metrics)
+            report_body = build_report_body(metrics)
+        if event_due:
+            event_body = build_event_body(build_event_payload(metrics))
+
+        if report_body and event_body and SETTINGS.COALESCE_TELEMETRY:
+            await send_telemetry(report_body, event_body)
+        else:
+            if report_body:
+                await send_or_buffer(SETTINGS.DASHBOARD_URL, report_body)
+            if event_body:
+                await send_or_buffer(SETTINGS.EVENT_URL, event_body)
 
-        # Offload simulation: if CPU high, try a peer
-        try:
-            if metrics["cpu"] > 90:
-                for url in peer_urls:
-                    try:
-                        r = session.get(url, timeout=2, verify=SETTINGS.VERIFY_TLS)
-                        r.raise_for_status()
-                        peer_status = r.json()
-                        if peer_status.get("cpu", 100) < 20:
-                            take_url = url.replace("/status", "/take_task")
-                            ok = safe_post_json(take_url, {"from": SETTINGS.AGENT_ID})
-                            if ok:
-                                logger.info("Negotiation: Offloaded task to peer at %s", url)
-                                break
-                    except Exception as e:
-                        logger.debug("Peer negotiation failed (%s): %s", url, e)
-        except Exception as e:
-            logger.debug("Offload logic error: %s", e)
+        if report_due:
+            await try_offload(metrics)
 
-        if stop_event.wait(SETTINGS.REPORT_INTERVAL):
+        deadline, ticks = next_deadline(deadline, tick)
+        n += ticks
+        if await wait_stop(deadline - time.monotonic()):
             break
 
-def buffer_flush_loop() -> None:
+async def buffer_flush_loop() -> None:
     logger.info("Buffer flush loop started.")
+    interval = SETTINGS.FLUSH_INTERVAL
     while not stop_event.is_set():
-        flush_buffered_events()
-        if stop_event.wait(SETTINGS.FLUSH_INTERVAL):
+        started = time.monotonic()
+        # Back off while the dashboard keeps failing; snap back once it recovers.
+        if await flush_buffered_events():
+            interval = SETTINGS.FLUSH_INTERVAL
+        else:
+            interval = min(interval * 2, SETTINGS.FLUSH_INTERVAL_MAX)
+        deadline, _ = next_deadline(started, interval)
+        if await wait_stop(deadline - time.monotonic()):
             break
 
 # ----------------------------
@@ -321,47 +885,132 @@ def buffer_flush_loop() -> None:
 
 app = FastAPI()
 
+# Probe bodies are static, so they are encoded once.
+_LIVE_BODY = orjson.dumps({"status": "alive", "agent_id": SETTINGS.AGENT_ID})
+_READY_BODY = orjson.dumps({"status": "ready", "agent_id": SETTINGS.AGENT_ID})
+_STARTING_BODY = orjson.dumps({"status": "starting", "agent_id": SETTINGS.AGENT_ID})
+
 @app.get("/status")
 def status():
-    return current_metrics or {"status": "initializing"}
+    return Response(status_body, media_type="application/json")
 
 @app.get("/live")
 def liveness():
-    return {"status": "alive", "agent_id": SETTINGS.AGENT_ID}
+    return Response(_LIVE_BODY, media_type="application/json")
 
 @app.get("/ready")
 def readiness():
     # Ready if we have at least one metrics collection
-    return {"status": "ready" if current_metrics else "starting", "agent_id": SETTINGS.AGENT_ID}
+    return Response(_READY_BODY if current_metrics else _STARTING_BODY, media_type="application/json")
 
 @app.post("/take_task")
 def take_task(data: dict):
     logger.info("Accepted task from %s", data.get('from'))
     return JSONResponse({"status": "accepted"})
 
-def start_peer_api() -> None:
-    uvicorn.run(app, host="0.0.0.0", port=SETTINGS.PEER_PORT, log_level="info")
+@app.on_event("startup")
+async def on_startup():
+    global client, buffer_ring, buffer_writer_thread
+    client = create_client()
+    buffer_ring = open_buffer_ring()
+    buffer_writer_thread = threading.Thread(target=buffer_writer, name="buffer-writer", daemon=True)
+    buffer_writer_thread.start()
+    await prewarm_client()
+    background_tasks.extend([
+        asyncio.create_task(metrics_sampler_loop(), name="metrics-sampler"),
+        asyncio.create_task(telemetry_loop(), name="telemetry-loop"),
+        asyncio.create_task(buffer_flush_loop(), name="buffer-flush"),
+    ])
+
+server: Optional[uvicorn.Server] = None
+shutdown_task: Optional[asyncio.Task] = None
+
+async def shutdown() -> None:
+    """
+    The single shutdown path: stop the loops, flush once more, release the
+    client and the ring, then tell uvicorn to exit.
+    """
+    logger.info("Shutting down...")
+    stop_event.set()
+    metrics_ready.set()  # release loops still waiting for a first sample
+    if background_tasks:
+        _, pending = await asyncio.wait(background_tasks, timeout=SETTINGS.SHUTDOWN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        background_tasks.clear()
+    if client is not None and buffer_ring is not None:
+        try:
+            # Retries end early once stop_event is set, so this is one attempt per batch
+            await asyncio.wait_for(flush_buffered_events(), SETTINGS.SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Final buffer flush timed out; events kept for next start.")
+    if client is not None:
+        await client.aclose()
+    if buffer_writer_thread is not None:
+        buffer_queue.put(None)  # drain pending records, then stop
+        await asyncio.to_thread(buffer_writer_thread.join, 5.0)
+    if buffer_ring is not None:
+        buffer_ring.close()
+    if server is not None:
+        server.should_exit = True
+
+def request_shutdown() -> asyncio.Task:
+    global shutdown_task
+    if shutdown_task is None:
+        shutdown_task = asyncio.get_running_loop().create_task(shutdown(), name="shutdown")
+    return shutdown_task
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Normally already done by the signal handler; covers any other exit path.
+    await request_shutdown()
+
+class AgentServer(uvicorn.Server):
+    """
+    uvicorn.Server that leaves SIGINT/SIGTERM to the agent's own handlers.
+    """
+
+    def install_signal_handlers(self) -> None:  # older uvicorn
+        pass
+
+    @contextlib.contextmanager
+    def capture_signals(self) -> Iterator[None]:  # newer uvicorn
+        yield
+
+async def serve() -> None:
+    global server
+    config = uvicorn.Config(
+        app,
+        host="0.0.0.0",
+        port=SETTINGS.PEER_PORT,
+        log_level="warning",
+        http="httptools" if HAVE_HTTPTOOLS else "h11",
+        access_log=False,  # peer probes would otherwise log a line per request
+    )
+    server = AgentServer(config)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, request_shutdown)
+        except NotImplementedError:
+            pass  # Windows: fall back to KeyboardInterrupt
+    await server.serve()
 
 # ----------------------------
-# Signal handling and main
+# Main
 # ----------------------------
 
-def handle_signal(signum, frame):
-    logger.info("Received signal %s, shutting down...", signum)
-    stop_event.set()
-
-signal.signal(signal.SIGINT, handle_signal)
-signal.signal(signal.SIGTERM, handle_signal)
-
 def main():
     logger.info("Starting Aegis Agent: %s", SETTINGS.AGENT_ID)
-    t1 = threading.Thread(target=report_loop, name="report-loop", daemon=True)
-    t2 = threading.Thread(target=tetragon_event_loop, name="tetragon-loop", daemon=True)
-    t3 = threading.Thread(target=buffer_flush_loop, name="buffer-flush", daemon=True)
-    t1.start()
-    t2.start()
-    t3.start()
-    start_peer_api()  # blocks until shutdown
+    # Telemetry/flush loops run as tasks on the same loop as the peer API
+    try:
+        if uvloop is not None:
+            uvloop.run(serve())
+        else:
+            asyncio.run(serve())
+    finally:
+        log_listener.stop()  # drains queued records before exit
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
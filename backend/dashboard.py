@@ -1,32 +1,66 @@
 import os
 import csv
-import json
 import time
+import hashlib
+import heapq
 import threading
 import logging
 from logging.handlers import RotatingFileHandler
-from collections import defaultdict, Counter
-from typing import Dict, Any, Optional, List
+from collections import defaultdict, deque, Counter, OrderedDict
+from itertools import islice
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Set, Tuple, NamedTuple, FrozenSet
+import queue
+import weakref
 import asyncio
+from concurrent.futures import Future, ProcessPoolExecutor, wait
 
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from fastapi.responses import ORJSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-import requests
+import httpx
+import orjson
 
 # Optional deps
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None
+
 try:
     import pandas as pd  # type: ignore
 except Exception:
     pd = None
 
+try:
+    import pyarrow as pa  # type: ignore
+    from pyarrow import csv as pa_csv  # type: ignore
+    import pyarrow.dataset as pa_ds  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+    HAVE_PYARROW = True
+except Exception:
+    HAVE_PYARROW = False
+
 try:
     from prophet import Prophet  # type: ignore
     HAVE_PROPHET = True
 except Exception:
     HAVE_PROPHET = False
 
+try:
+    from neuralprophet import NeuralProphet  # type: ignore
+    HAVE_NEURALPROPHET = True
+except Exception:
+    HAVE_NEURALPROPHET = False
+
+try:
+    from statsforecast import StatsForecast  # type: ignore
+    from statsforecast.models import AutoARIMA, AutoETS  # type: ignore
+    HAVE_STATSFORECAST = True
+except Exception:
+    HAVE_STATSFORECAST = False
+
 try:
     from dotenv import load_dotenv  # type: ignore
     load_dotenv()
@@ -39,6 +73,12 @@ class Settings:
     DATA_DIR: str = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
     LOG_DIR: str = os.getenv("LOG_DIR", os.path.join(BASE_DIR, "logs"))
     METRICS_HISTORY_FILE: str = os.getenv("METRICS_HISTORY_FILE", os.path.join(DATA_DIR, "metrics_history.csv"))
+    # "auto" (parquet when pyarrow is installed, else csv), "csv" or "parquet"
+    METRICS_BACKEND: str = os.getenv("METRICS_BACKEND", "auto").lower()
+    METRICS_HISTORY_PARQUET: str = os.getenv("METRICS_HISTORY_PARQUET", os.path.join(DATA_DIR, "metrics_history.parquet"))
+    PARQUET_FLUSH_ROWS: int = int(os.getenv("PARQUET_FLUSH_ROWS", "1000"))  # rows buffered per dataset write
+    # With parquet, the CSV is kept only as a rolling debug log of this size
+    METRICS_CSV_DEBUG_MAX_BYTES: int = int(os.getenv("METRICS_CSV_DEBUG_MAX_BYTES", str(5_000_000)))
 
     PREDICTION_INTERVAL_SEC: int = int(os.getenv("PREDICTION_INTERVAL_SEC", "60"))
     PREDICTIVE_CPU_THRESHOLD: float = float(os.getenv("PREDICTIVE_CPU_THRESHOLD", "90.0"))
@@ -47,6 +87,18 @@ class Settings:
     AGENT_TIMEOUT_SEC: int = int(os.getenv("AGENT_TIMEOUT_SEC", "30"))
     BASELINE_UPDATE_INTERVAL_SEC: int = int(os.getenv("BASELINE_UPDATE_INTERVAL_SEC", "60"))
     FORECAST_PERIODS_MIN: int = int(os.getenv("FORECAST_PERIODS_MIN", "60"))
+    # "auto" (ets when statsforecast is installed, else prophet), "ets" (AutoETS on
+    # 1-minute means), "prophet", "neuralprophet", "statsforecast" (AutoARIMA) or "naive"
+    FORECAST_ENGINE: str = os.getenv("FORECAST_ENGINE", "auto").lower()
+    ETS_SEASON_LENGTH: int = int(os.getenv("ETS_SEASON_LENGTH", "60"))  # minutes per season for AutoETS
+    FORECAST_WORKERS: int = int(os.getenv("FORECAST_WORKERS", str(os.cpu_count() or 1)))  # processes fitting agents in parallel
+    CSV_BATCH_SIZE: int = int(os.getenv("CSV_BATCH_SIZE", "500"))  # metric rows written (and flushed) per batch
+    METRICS_QUEUE_SIZE: int = int(os.getenv("METRICS_QUEUE_SIZE", "10000"))  # rows waiting for the writer; more are dropped
+    AGENT_HISTORY_MAXLEN: int = int(os.getenv("AGENT_HISTORY_MAXLEN", "10000"))  # (ts, cpu) rows kept per agent
+    # Reuse an agent's fitted Prophet forecast until this many new rows arrive
+    PROPHET_REFIT_MIN_ROWS: int = int(os.getenv("PROPHET_REFIT_MIN_ROWS", "10"))
+    PROPHET_MAX_FIT_ROWS: int = int(os.getenv("PROPHET_MAX_FIT_ROWS", "2000"))  # most recent 1-minute points fitted
+    PROPHET_DAILY_FOURIER_ORDER: int = int(os.getenv("PROPHET_DAILY_FOURIER_ORDER", "4"))
 
     # Added: pressure-based classification thresholds (env-tunable)
     PRESSURE_BUSY: float = float(os.getenv("PRESSURE_BUSY", "65.0"))
@@ -61,12 +113,18 @@ class Settings:
     MAX_LOAD_BALANCING_ACTIONS: int = int(os.getenv("MAX_LOAD_BALANCING_ACTIONS", "20"))
     MAX_TETRAGON_EVENTS: int = int(os.getenv("MAX_TETRAGON_EVENTS", "50000"))
     MAX_RECENT_ANOMALIES: int = int(os.getenv("MAX_RECENT_ANOMALIES", "100"))
+    SUMMARY_INTERVAL_SEC: float = float(os.getenv("SUMMARY_INTERVAL_SEC", "1.0"))  # summary refresh/publish rate
+    SSE_QUEUE_SIZE: int = int(os.getenv("SSE_QUEUE_SIZE", "1000"))  # frames a slow client may lag behind before it is dropped
+    SSE_BATCH_WINDOW_MS: float = float(os.getenv("SSE_BATCH_WINDOW_MS", "20"))  # coalescing window per subscriber
 
     ENABLE_GROQ: bool = os.getenv("ENABLE_GROQ", "false").lower() == "true"
     GROQ_API_URL: str = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
     GROQ_API_KEY: Optional[str] = os.getenv("GROQ_API_KEY")
     GROQ_MODEL: str = os.getenv("GROQ_MODEL", "llama3-70b-8192")
     GROQ_TIMEOUT: float = float(os.getenv("GROQ_TIMEOUT", "15"))
+    GROQ_MAX_KEEPALIVE: int = int(os.getenv("GROQ_MAX_KEEPALIVE", "32"))  # idle pooled connections kept open
+    GROQ_CACHE_SIZE: int = int(os.getenv("GROQ_CACHE_SIZE", "1024"))  # cached verdicts for repeated (baseline, event)
+    EVENT_BATCH_CONCURRENCY: int = int(os.getenv("EVENT_BATCH_CONCURRENCY", "8"))  # replayed events analyzed at once
 
 SETTINGS = Settings()
 os.makedirs(SETTINGS.DATA_DIR, exist_ok=True)
@@ -82,7 +140,30 @@ console = logging.StreamHandler()
 console.setFormatter(fmt)
 logger.addHandler(console)
 
-app = FastAPI()
+def resolve_forecast_engine() -> str:
+    engine = SETTINGS.FORECAST_ENGINE
+    if pd is None:
+        return "naive"
+    if engine == "auto":
+        engine = "ets" if HAVE_STATSFORECAST else "prophet"
+    if engine in ("ets", "statsforecast") and not HAVE_STATSFORECAST:
+        logger.warning("FORECAST_ENGINE=%s but statsforecast is not installed.", engine)
+        engine = "prophet"
+    if engine == "neuralprophet" and not HAVE_NEURALPROPHET:
+        logger.warning("FORECAST_ENGINE=neuralprophet but neuralprophet is not installed.")
+        engine = "prophet"
+    if engine == "prophet" and not HAVE_PROPHET:
+        engine = "naive"
+    return engine if engine in ("ets", "prophet", "neuralprophet", "statsforecast") else "naive"
+
+
+FORECAST_ENGINE = resolve_forecast_engine()
+
+USE_PARQUET = SETTINGS.METRICS_BACKEND in ("auto", "parquet") and HAVE_PYARROW and pd is not None
+if SETTINGS.METRICS_BACKEND == "parquet" and not USE_PARQUET:
+    logger.warning("METRICS_BACKEND=parquet needs pandas and pyarrow; using CSV.")
+
+app = FastAPI(default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=SETTINGS.ALLOW_ORIGINS,
@@ -91,118 +172,345 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Shared state
-agent_data_lock = threading.Lock()
-tetragon_lock = threading.Lock()
-baseline_lock = threading.Lock()
-actions_lock = threading.Lock()
+# Shared state. Each structure has its own lock; readers take a tuple snapshot
+# under it and work lock-free afterwards (agent_data readers go through
+# agent_snapshot()). agent_data records are replaced on every report, never
+# mutated, so snapshotted records stay consistent.
+agent_data_lock = threading.RLock()
+tetragon_lock = threading.RLock()
+baseline_lock = threading.RLock()
+actions_lock = threading.RLock()
 csv_lock = threading.Lock()
-recent_anomalies_lock = threading.Lock()
+parquet_lock = threading.Lock()
+recent_anomalies_lock = threading.RLock()
+agent_history_lock = threading.Lock()
 
 agent_data: Dict[str, Dict[str, Any]] = {}
-tetragon_events: List[Dict[str, Any]] = []
+# Bumped under agent_data_lock on every write; agent_snapshot() copies
+# agent_data only when it has moved since the last copy.
+_agent_data_version = 0
+_agent_snapshot: Tuple[int, Dict[str, Dict[str, Any]]] = (-1, {})
+tetragon_events: deque = deque(maxlen=SETTINGS.MAX_TETRAGON_EVENTS)
 agent_baselines: Dict[str, Dict[str, Any]] = defaultdict(dict)
-load_balancing_actions: List[Dict[str, Any]] = []
-recent_anomalies: List[Dict[str, Any]] = []
+# Encoded agent_baselines entries, refreshed with them, for the Groq prompt
+agent_baselines_json: Dict[str, bytes] = {}
+# Baseline checks prepared at update time (see baseline_rules)
+agent_baseline_rules: Dict[str, "BaselineRules"] = {}
+load_balancing_actions: deque = deque(maxlen=SETTINGS.MAX_LOAD_BALANCING_ACTIONS)
+recent_anomalies: deque = deque(maxlen=SETTINGS.MAX_RECENT_ANOMALIES)
+# Rolling (timestamp, cpu) history per agent for forecasting, so the CSV is only
+# parsed once (to warm this on first use). agent_history_rows counts every row
+# ever appended, since the deques stop growing at maxlen.
+agent_history: Dict[str, deque] = defaultdict(lambda: deque(maxlen=SETTINGS.AGENT_HISTORY_MAXLEN))
+agent_history_rows: Dict[str, int] = defaultdict(int)
+_agent_history_warm = False
+# {agent_id: (agent_history_rows at build time, DataFrame)}
+_history_frames: Dict[str, Tuple[int, Any]] = {}
 
 stop_event = threading.Event()
-
-# Real-time SSE subscribers
+background_tasks: List[asyncio.Task] = []
+# Replayed event batches still being analyzed (see receive_event_batch)
+_replay_tasks: Set[asyncio.Task] = set()
+
+# Per-agent forecasts: {agent_id: {"result", "rows", "last_ds"}}
+_forecast_cache: Dict[str, Dict[str, Any]] = {}
+# Fits submitted but not finished, so slow ones are not resubmitted every cycle
+_forecast_inflight: Dict[str, Future] = {}
+_forecast_cache_lock = threading.Lock()
+
+# Real-time SSE subscribers. Only touched from APP_LOOP (publishes from other
+# threads are handed over to it), so the set needs no lock; entries go away
+# with their stream even if its cleanup never runs.
 APP_LOOP: Optional[asyncio.AbstractEventLoop] = None
-_sse_subscribers: List[asyncio.Queue] = []
-_sse_lock = threading.Lock()
+_sse_subscribers: "weakref.WeakSet[SSESubscriber]" = weakref.WeakSet()
+
+
+# (epoch second, formatted string); swapped as one tuple so threads never see
+# a half-updated pair.
+_now_str_cache = (0, "")
 
 
 def now_str() -> str:
-    return time.strftime("%Y-%m-%d %H:%M:%S")
+    global _now_str_cache
+    second = int(time.time())
+    cached = _now_str_cache
+    if cached[0] != second:
+        cached = (second, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second)))
+        _now_str_cache = cached
+    return cached[1]
+
+
+class SSESubscriber:
+    """One /api/stream client: a bounded queue of (frame, urgent) items."""
 
+    __slots__ = ("queue", "dropped", "__weakref__")
 
-def sse_subscribe(q: asyncio.Queue) -> None:
-    with _sse_lock:
-        _sse_subscribers.append(q)
+    def __init__(self) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SETTINGS.SSE_QUEUE_SIZE)
+        self.dropped = False
 
 
-def sse_unsubscribe(q: asyncio.Queue) -> None:
-    with _sse_lock:
-        if q in _sse_subscribers:
-            _sse_subscribers.remove(q)
+def sse_subscribe(sub: SSESubscriber) -> None:
+    _sse_subscribers.add(sub)
+
+
+def sse_unsubscribe(sub: SSESubscriber) -> None:
+    _sse_subscribers.discard(sub)
+
+
+SSE_URGENT_TYPES = frozenset({"anomaly"})
+
+
+def _sse_deliver(item: Tuple[bytes, bool]) -> None:
+    dropped = []
+    for sub in _sse_subscribers:
+        try:
+            sub.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Client is not keeping up; its stream ends and the browser
+            # reconnects for a fresh snapshot
+            sub.dropped = True
+            dropped.append(sub)
+    for sub in dropped:
+        _sse_subscribers.discard(sub)
 
 
 def sse_publish(event_type: str, data: Dict[str, Any]) -> None:
     """
-    Thread-safe publish to all SSE subscribers.
+    Thread-safe publish to all SSE subscribers. The message is encoded into a
+    complete SSE frame once and the same bytes are queued for every subscriber.
     """
-    message = {"type": event_type, "time": now_str(), "data": data}
-    with _sse_lock:
-        targets = list(_sse_subscribers)
-    if not targets or APP_LOOP is None or not APP_LOOP.is_running():
+    if not _sse_subscribers or APP_LOOP is None or not APP_LOOP.is_running():
         return
-    for q in targets:
-        try:
-            asyncio.run_coroutine_threadsafe(q.put(message), APP_LOOP)
-        except Exception as e:
-            logger.debug("SSE publish failed: %s", e)
+    frame = b"data: " + orjson.dumps({"type": event_type, "time": now_str(), "data": data}) + b"\n\n"
+    # Anomalies end the subscriber's batching window so they go out at once
+    item = (frame, event_type in SSE_URGENT_TYPES)
+    try:
+        on_loop = asyncio.get_running_loop() is APP_LOOP
+    except RuntimeError:
+        on_loop = False
+    try:
+        if on_loop:
+            _sse_deliver(item)
+        else:
+            APP_LOOP.call_soon_threadsafe(_sse_deliver, item)
+    except Exception as e:
+        logger.debug("SSE publish failed: %s", e)
+
+
+def agent_snapshot() -> Dict[str, Dict[str, Any]]:
+    """
+    Copy of agent_data shared by every reader until the next write. Callers
+    must treat it as read-only.
+    """
+    global _agent_snapshot
+    snapshot = _agent_snapshot
+    if snapshot[0] != _agent_data_version:
+        with agent_data_lock:
+            snapshot = (_agent_data_version, dict(agent_data))
+            _agent_snapshot = snapshot
+    return snapshot[1]
+
+
+def tail(items: deque, n: int) -> List[Any]:
+    """Last n items of a deque, oldest first, walking only those n."""
+    return list(islice(reversed(items), n))[::-1]
 
 
 def append_load_balancing_action(action: Dict[str, Any]) -> None:
     with actions_lock:
-        load_balancing_actions.append(action)
-        if len(load_balancing_actions) > SETTINGS.MAX_LOAD_BALANCING_ACTIONS:
-            del load_balancing_actions[0: len(load_balancing_actions) - SETTINGS.MAX_LOAD_BALANCING_ACTIONS]
+        load_balancing_actions.append(action)  # deque drops the oldest past MAX_LOAD_BALANCING_ACTIONS
     sse_publish("load_balancing", action)
 
 
 def push_tetragon_event(evt: Dict[str, Any]) -> None:
     with tetragon_lock:
-        tetragon_events.append(evt)
-        if len(tetragon_events) > SETTINGS.MAX_TETRAGON_EVENTS:
-            del tetragon_events[0: len(tetragon_events) - SETTINGS.MAX_TETRAGON_EVENTS]
+        tetragon_events.append(evt)  # deque drops the oldest past MAX_TETRAGON_EVENTS
 
 
 def record_anomaly(entry: Dict[str, Any]) -> None:
     with recent_anomalies_lock:
-        recent_anomalies.append(entry)
-        if len(recent_anomalies) > SETTINGS.MAX_RECENT_ANOMALIES:
-            del recent_anomalies[0: len(recent_anomalies) - SETTINGS.MAX_RECENT_ANOMALIES]
+        recent_anomalies.append(entry)  # deque drops the oldest past MAX_RECENT_ANOMALIES
     sse_publish("anomaly", entry)
 
 
-def log_metric_to_csv(data: Dict[str, Any]) -> None:
+CSV_HEADERS = ["timestamp", "agent_id", "cpu", "memory", "disk"]
+
+# Long-lived metrics CSV handle, written only by the metrics writer thread;
+# csv_lock also lets other threads flush it (before it is served, on shutdown).
+_csv_fh = None
+_csv_writer: Optional[csv.DictWriter] = None
+
+
+def _open_metrics_csv() -> None:
+    global _csv_fh, _csv_writer
     path = SETTINGS.METRICS_HISTORY_FILE
-    headers = ["timestamp", "agent_id", "cpu", "memory", "disk"]
+    file_exists = os.path.isfile(path)
+    _csv_fh = open(path, "a", newline="", encoding="utf-8", buffering=1 << 20)
+    _csv_writer = csv.DictWriter(_csv_fh, fieldnames=CSV_HEADERS, extrasaction="ignore")
+    if not file_exists:
+        _csv_writer.writeheader()
+
+
+def flush_metrics_csv(close: bool = False) -> None:
+    global _csv_fh, _csv_writer
+    with csv_lock:
+        if _csv_fh is None:
+            return
+        try:
+            _csv_fh.flush()
+            if close:
+                _csv_fh.close()
+                _csv_fh = _csv_writer = None
+        except Exception as e:
+            logger.error("Failed to flush metrics CSV: %s", e)
+
+
+def write_metrics_csv(rows: List[Tuple[Dict[str, Any], datetime, str]]) -> None:
     try:
         with csv_lock:
-            file_exists = os.path.isfile(path)
-            with open(path, "a", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=headers, extrasaction="ignore")
-                if not file_exists:
-                    writer.writeheader()
-                row = {
-                    "timestamp": now_str(),
+            if _csv_writer is None:
+                _open_metrics_csv()
+            _csv_writer.writerows(
+                {
+                    "timestamp": ts_str,
                     "agent_id": data.get("agent_id"),
                     "cpu": data.get("cpu"),
                     "memory": data.get("memory"),
                     "disk": data.get("disk"),
                 }
-                writer.writerow(row)
+                for data, _, ts_str in rows
+            )
+            _csv_fh.flush()
+            if USE_PARQUET and _csv_fh.tell() > SETTINGS.METRICS_CSV_DEBUG_MAX_BYTES:
+                _roll_metrics_csv()
     except Exception as e:
         logger.error("Failed to write metrics CSV: %s", e)
 
 
-def build_summary() -> Dict[str, Any]:
-    with agent_data_lock:
-        agents = dict(agent_data)
+def _roll_metrics_csv() -> None:
+    # Called with csv_lock held; keeps one previous debug file
+    global _csv_fh, _csv_writer
+    _csv_fh.close()
+    _csv_fh = _csv_writer = None
+    path = SETTINGS.METRICS_HISTORY_FILE
+    os.replace(path, path + ".1")
+    _open_metrics_csv()
+
+
+# Parquet backend: rows are buffered and appended to the agent-partitioned
+# dataset every PARQUET_FLUSH_ROWS rows. File names start with a nanosecond
+# timestamp so each partition reads back in arrival order. Timestamps are
+# int64 nanoseconds of the local wall clock (the same naive time the CSV and
+# agent_history use), so reading them back is a plain integer column.
+_EPOCH = datetime(1970, 1, 1)
+_parquet_rows: List[Dict[str, Any]] = []
+PARQUET_SCHEMA = pa.schema([
+    ("timestamp", pa.int64()),
+    ("agent_id", pa.string()),
+    ("cpu", pa.float64()),
+    ("memory", pa.float64()),
+    ("disk", pa.float64()),
+]) if HAVE_PYARROW else None
+PARQUET_PARTITIONING = pa_ds.partitioning(pa.schema([("agent_id", pa.string())]), flavor="hive") if HAVE_PYARROW else None
+
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _write_parquet_table(table: Any) -> None:
+    pq.write_to_dataset(
+        table,
+        root_path=SETTINGS.METRICS_HISTORY_PARQUET,
+        partition_cols=["agent_id"],
+        basename_template=f"part-{time.time_ns()}-{{i}}.parquet",
+    )
+
+
+def _write_parquet_rows(rows: List[Dict[str, Any]]) -> None:
+    try:
+        _write_parquet_table(pa.Table.from_pylist(rows, schema=PARQUET_SCHEMA))
+    except Exception as e:
+        logger.error("Failed to write metrics parquet: %s", e)
+
+
+def log_metric_to_parquet(data: Dict[str, Any], ts: datetime) -> None:
+    row = {
+        "timestamp": (ts - _EPOCH) // timedelta(microseconds=1) * 1000,
+        "agent_id": str(data.get("agent_id")),
+        "cpu": _as_float(data.get("cpu")),
+        "memory": _as_float(data.get("memory")),
+        "disk": _as_float(data.get("disk")),
+    }
+    with parquet_lock:
+        _parquet_rows.append(row)
+        if len(_parquet_rows) < SETTINGS.PARQUET_FLUSH_ROWS:
+            return
+        rows = _parquet_rows[:]
+        _parquet_rows.clear()
+    _write_parquet_rows(rows)
+
+
+def flush_metrics_parquet() -> None:
+    with parquet_lock:
+        rows = _parquet_rows[:]
+        _parquet_rows.clear()
+    if rows:
+        _write_parquet_rows(rows)
+
+
+# Reports only enqueue their metric row; one writer thread drains the queue in
+# batches of up to CSV_BATCH_SIZE rows. A None entry stops the thread.
+_metrics_queue: "queue.Queue[Any]" = queue.Queue(maxsize=SETTINGS.METRICS_QUEUE_SIZE)
+_metrics_writer_thread: Optional[threading.Thread] = None
+
+
+def log_metric(data: Dict[str, Any], ts: datetime, ts_str: str) -> None:
+    try:
+        _metrics_queue.put_nowait((data, ts, ts_str))
+    except queue.Full:
+        logger.warning("Metrics queue full; dropping row for %s.", data.get("agent_id"))
+
+
+def metrics_writer_loop() -> None:
+    while True:
+        batch = [_metrics_queue.get()]
+        while batch[-1] is not None and len(batch) < SETTINGS.CSV_BATCH_SIZE:
+            try:
+                batch.append(_metrics_queue.get_nowait())
+            except queue.Empty:
+                break
+        stopping = batch[-1] is None
+        rows = batch[:-1] if stopping else batch
+        if rows:
+            if USE_PARQUET:
+                for data, ts, _ in rows:
+                    log_metric_to_parquet(data, ts)
+            write_metrics_csv(rows)
+        if stopping:
+            return
+
+
+_summary_cache: Dict[str, Any] = {"t": 0.0, "value": None}
+_summary_lock = threading.Lock()
+
+
+def compute_summary() -> Dict[str, Any]:
+    agents = agent_snapshot()
     with actions_lock:
-        actions = list(load_balancing_actions)[-5:]
+        actions = tail(load_balancing_actions, 5)
     with recent_anomalies_lock:
-        anomalies = list(recent_anomalies)[-5:]
+        anomalies = tail(recent_anomalies, 5)
 
     # Top busy by CPU
-    top_busy = sorted(
-        [{"agent_id": aid, "cpu": float(rec.get("cpu", 0.0))} for aid, rec in agents.items()],
-        key=lambda x: x["cpu"],
-        reverse=True,
-    )[:5]
+    top_busy = [
+        {"agent_id": aid, "cpu": cpu}
+        for cpu, aid in heapq.nlargest(5, ((float(rec.get("cpu", 0.0)), aid) for aid, rec in agents.items()))
+    ]
 
     summary = {
         "agents_total": len(agents),
@@ -214,94 +522,390 @@ def build_summary() -> Dict[str, Any]:
     return summary
 
 
+def build_summary() -> Dict[str, Any]:
+    """Summary at most SUMMARY_INTERVAL_SEC old; recomputed only when stale."""
+    with _summary_lock:
+        if _summary_cache["value"] is None or time.monotonic() - _summary_cache["t"] >= SETTINGS.SUMMARY_INTERVAL_SEC:
+            _summary_cache["value"] = compute_summary()
+            _summary_cache["t"] = time.monotonic()
+        return _summary_cache["value"]
+
+
+def append_agent_history(agent_id: str, ts: datetime, cpu: Any) -> None:
+    try:
+        value = float(cpu)
+    except (TypeError, ValueError):
+        return
+    with agent_history_lock:
+        agent_history[agent_id].append((ts, value))
+        agent_history_rows[agent_id] += 1
+
+
+HISTORY_COLUMNS = ["timestamp", "agent_id", "cpu"]
+HISTORY_CHUNK_ROWS = 100_000
+
+
+def iter_metrics_history(from_parquet: bool, columns: List[str] = HISTORY_COLUMNS) -> Any:
+    """
+    Streams the metrics history (the CSV or the parquet dataset) as DataFrames
+    of `columns` with parsed timestamps, one block at a time, so peak memory is
+    a block rather than the whole file.
+    """
+    if from_parquet:
+        dataset = pa_ds.dataset(SETTINGS.METRICS_HISTORY_PARQUET, format="parquet", partitioning=PARQUET_PARTITIONING)
+        for batch in dataset.to_batches(columns=columns):
+            df = batch.to_pandas()
+            df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ns")
+            yield df
+        return
+    path = SETTINGS.METRICS_HISTORY_FILE
+    if not HAVE_PYARROW:
+        yield from read_history_csv(path, columns)
+        return
+
+    read = bad = 0
+
+    def skip_row(row: Any) -> str:
+        nonlocal bad
+        bad += 1
+        return "skip"
+
+    reader = pa_csv.open_csv(
+        path,
+        parse_options=pa_csv.ParseOptions(invalid_row_handler=skip_row),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={
+                "timestamp": pa.timestamp("s"), "agent_id": pa.string(),
+                "cpu": pa.float64(), "memory": pa.float64(), "disk": pa.float64(),
+            },
+        ),
+    )
+    try:
+        for batch in reader:
+            read += batch.num_rows
+            yield batch.to_pandas()
+    except pa.ArrowInvalid as e:
+        # A value that does not convert ends the typed stream; pandas coerces
+        # it, so it reads the rest (resuming by row count, which a torn row in
+        # the failed block can put a few rows off)
+        logger.warning("Malformed value in %s (%s); reading the rest with pandas.", path, e)
+        yield from read_history_csv(path, columns, skip=read + bad)
+    if bad:
+        logger.warning("Skipped %d malformed rows in %s.", bad, path)
+
+
+def read_history_csv(path: str, columns: List[str], skip: int = 0) -> Any:
+    """
+    pandas reader for iter_metrics_history: unparseable values become NaN/NaT
+    and rows with extra fields are skipped.
+    """
+    chunks = pd.read_csv(
+        path, usecols=columns, chunksize=HISTORY_CHUNK_ROWS, skiprows=range(1, skip + 1), on_bad_lines="skip"
+    )
+    for df in chunks:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+        yield df
+
+
+def migrate_csv_to_parquet() -> None:
+    """
+    One-off import of an existing metrics CSV into the parquet dataset the
+    first time the parquet backend starts.
+    """
+    try:
+        for df in iter_metrics_history(False, CSV_HEADERS):
+            for col in ("cpu", "memory", "disk"):
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+            df.dropna(subset=["timestamp", "agent_id"], inplace=True)
+            df["timestamp"] = df["timestamp"].astype("datetime64[ns]").astype("int64")
+            df["agent_id"] = df["agent_id"].astype(str)
+            table = pa.Table.from_pandas(df[CSV_HEADERS], schema=PARQUET_SCHEMA, preserve_index=False)
+            _write_parquet_table(table)
+        logger.info("Imported %s into the parquet history.", SETTINGS.METRICS_HISTORY_FILE)
+    except Exception as e:
+        logger.error("Failed to import metrics CSV into parquet: %s", e)
+
+
+def warm_agent_history() -> None:
+    """
+    Loads the stored history into agent_history once (cold start). Runs at
+    startup, before any report is appended.
+    """
+    global _agent_history_warm
+    with agent_history_lock:
+        if _agent_history_warm:
+            return
+        _agent_history_warm = True
+        if not pd:
+            return
+        if USE_PARQUET and not os.path.exists(SETTINGS.METRICS_HISTORY_PARQUET) and os.path.exists(SETTINGS.METRICS_HISTORY_FILE):
+            migrate_csv_to_parquet()
+        history_path = SETTINGS.METRICS_HISTORY_PARQUET if USE_PARQUET else SETTINGS.METRICS_HISTORY_FILE
+        if not os.path.exists(history_path):
+            return
+        try:
+            for df in iter_metrics_history(USE_PARQUET):
+                df["cpu"] = pd.to_numeric(df["cpu"], errors="coerce")
+                df.dropna(inplace=True)
+                for agent_id, group in df.groupby("agent_id", sort=False):
+                    rows = zip(group["timestamp"].dt.to_pydatetime(), group["cpu"].astype(float))
+                    agent_history[agent_id].extend(rows)
+                    agent_history_rows[agent_id] += len(group)
+        except Exception as e:
+            logger.error("Failed to load metrics history: %s", e)
+
+
+def agent_history_frame(agent_id: str) -> Tuple[Any, int]:
+    """
+    (DataFrame with ds/y columns, total rows seen) for an agent. Frames are
+    cached until the agent's row count moves, so callers must not modify them.
+    """
+    warm_agent_history()
+    with agent_history_lock:
+        total = agent_history_rows.get(agent_id, 0)
+        cached = _history_frames.get(agent_id)
+        if cached is not None and cached[0] == total:
+            return cached[1], total
+        rows = list(agent_history.get(agent_id) or ())
+    df = pd.DataFrame(rows, columns=["ds", "y"])
+    with agent_history_lock:
+        _history_frames[agent_id] = (total, df)
+    return df, total
+
+
+def future_minutes(last_ts: datetime, periods: int) -> List[str]:
+    """Formatted timestamps for the `periods` minutes after last_ts."""
+    if np is not None:
+        steps = np.datetime64(last_ts.replace(microsecond=0), "s") + np.arange(1, periods + 1).astype("timedelta64[m]")
+        return [ts.replace("T", " ") for ts in np.datetime_as_string(steps, unit="s").tolist()]
+    return [(last_ts + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S") for i in range(1, periods + 1)]
+
+
 def naive_forecast(agent_id: str) -> Dict[str, Any]:
+    """
+    Flat forecast at the mean of the last 30 samples, read straight from the
+    in-memory history (appended in time order), so no DataFrame is built.
+    """
     try:
-        if not pd or not os.path.exists(SETTINGS.METRICS_HISTORY_FILE):
-            return {"error": "No history available"}
-        df = pd.read_csv(SETTINGS.METRICS_HISTORY_FILE)
-        agent_df = df[df["agent_id"] == agent_id].copy()
-        if len(agent_df) < 5:
+        warm_agent_history()
+        with agent_history_lock:
+            history = agent_history.get(agent_id) or ()
+            if len(history) < 5:
+                return {"error": "Not enough historical data."}
+            recent = list(islice(reversed(history), 30))
+        last_ts = recent[0][0]
+        values = [cpu for _, cpu in recent if cpu == cpu]  # skip NaN samples
+        if not values:
             return {"error": "Not enough historical data."}
-        agent_df["timestamp"] = pd.to_datetime(agent_df["timestamp"])
-        agent_df.sort_values("timestamp", inplace=True)
-        window = min(30, len(agent_df))
-        mean_cpu = float(agent_df["cpu"].tail(window).mean())
-        last_ts = agent_df["timestamp"].iloc[-1]
-        future = [
-            {"ds": (last_ts + pd.Timedelta(minutes=i + 1)).strftime("%Y-%m-%d %H:%M:%S"), "yhat": mean_cpu}
-            for i in range(SETTINGS.FORECAST_PERIODS_MIN)
-        ]
+        mean_cpu = sum(values) / len(values)
+        future = [{"ds": ds, "yhat": mean_cpu} for ds in future_minutes(last_ts, SETTINGS.FORECAST_PERIODS_MIN)]
         spike_info = None
-        if mean_cpu > SETTINGS.PREDICTIVE_CPU_THRESHOLD:
+        if mean_cpu > SETTINGS.PREDICTIVE_CPU_THRESHOLD and future:
             spike_info = {"predicted_time": future[0]["ds"], "predicted_value": round(mean_cpu, 2)}
         return {"spike_info": spike_info, "forecast": future}
     except Exception as e:
         return {"error": str(e)}
 
 
-def train_and_predict(agent_id: str, return_forecast: bool = False) -> Optional[Dict[str, Any]]:
-    try:
-        if not pd or not os.path.exists(SETTINGS.METRICS_HISTORY_FILE):
-            return naive_forecast(agent_id) if return_forecast else None
+def _forecast_result(forecast: Any) -> Dict[str, Any]:
+    future_spikes = forecast[forecast["yhat"] > SETTINGS.PREDICTIVE_CPU_THRESHOLD]
+    spike_info = None
+    if not future_spikes.empty:
+        predicted_time = future_spikes["ds"].iloc[0]
+        predicted_value = round(float(future_spikes["yhat"].iloc[0]), 2)
+        spike_info = {"predicted_time": predicted_time.strftime("%Y-%m-%d %H:%M:%S"), "predicted_value": predicted_value}
+    return {
+        "spike_info": spike_info,
+        "forecast": forecast[["ds", "yhat"]].tail(SETTINGS.FORECAST_PERIODS_MIN).assign(
+            ds=lambda x: x["ds"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+            yhat=lambda x: x["yhat"].astype(float),
+        ).to_dict(orient="records"),
+    }
 
-        df = pd.read_csv(SETTINGS.METRICS_HISTORY_FILE)
-        agent_df = df[df["agent_id"] == agent_id].copy()
-        if len(agent_df) < 5:
-            return {"error": "Not enough historical data."} if return_forecast else None
-
-        agent_df.rename(columns={"timestamp": "ds", "cpu": "y"}, inplace=True)
-        agent_df["ds"] = pd.to_datetime(agent_df["ds"])
-
-        if HAVE_PROPHET:
-            model = Prophet(interval_width=0.95, daily_seasonality=True)
-            model.fit(agent_df)
-            future = model.make_future_dataframe(periods=SETTINGS.FORECAST_PERIODS_MIN, freq="min")
-            forecast = model.predict(future)
-            future_spikes = forecast[forecast["yhat"] > SETTINGS.PREDICTIVE_CPU_THRESHOLD]
-            spike_info = None
-            if not future_spikes.empty:
-                predicted_time = future_spikes["ds"].iloc[0]
-                predicted_value = round(float(future_spikes["yhat"].iloc[0]), 2)
-                spike_info = {"predicted_time": predicted_time.strftime("%Y-%m-%d %H:%M:%S"), "predicted_value": predicted_value}
-
-            if return_forecast:
-                data = {
-                    "spike_info": spike_info,
-                    "forecast": forecast[["ds", "yhat"]].tail(SETTINGS.FORECAST_PERIODS_MIN).assign(
-                        ds=lambda x: x["ds"].dt.strftime("%Y-%m-%d %H:%M:%S"),
-                        yhat=lambda x: x["yhat"].astype(float),
-                    ).to_dict(orient="records"),
-                }
-                return data
-            return None
-        else:
-            return naive_forecast(agent_id) if return_forecast else None
-    except Exception as e:
-        return {"error": str(e)} if return_forecast else None
+
+def fit_prophet(agent_id: str, agent_df: Any) -> Tuple[Any, Any]:
+    # Forecasts are per minute, so sub-minute samples only slow the fit down;
+    # fit cost grows with history length, so keep the most recent minutes only
+    series = agent_df.set_index("ds")["y"].resample("min").mean().dropna().reset_index()
+    if len(series) < 2:
+        series = agent_df
+    series = series.tail(SETTINGS.PROPHET_MAX_FIT_ROWS)
+    # Only yhat is used, so skip the uncertainty sampling in predict. Built-in
+    # seasonalities are off; a daily one is added back once history covers it.
+    model = Prophet(
+        interval_width=0.95,
+        daily_seasonality=False,
+        weekly_seasonality=False,
+        yearly_seasonality=False,
+        uncertainty_samples=0,
+    )
+    if series["ds"].iloc[-1] - series["ds"].iloc[0] > pd.Timedelta(days=1):
+        model.add_seasonality(name="daily", period=1, fourier_order=SETTINGS.PROPHET_DAILY_FOURIER_ORDER)
+    model.fit(series)
+    # Only the future rows are used, so don't predict over the whole history
+    future = model.make_future_dataframe(periods=SETTINGS.FORECAST_PERIODS_MIN, freq="min", include_history=False)
+    return model, model.predict(future)
 
 
-def analyze_with_groq(baseline: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
-    def local_rules() -> Dict[str, Any]:
-        problems: List[str] = []
-        allowed_procs = set(baseline.get("allowed_processes", []))
-        allowed_ports = set(baseline.get("allowed_ports", []))
-        max_disk = baseline.get("allowed_disk_usage", 90)
-        max_mem = baseline.get("allowed_memory", 95)
-
-        proc = event.get("process")
-        port = event.get("port")
-        disk = event.get("disk")
-        mem = event.get("memory")
-
-        if proc and allowed_procs and proc not in allowed_procs:
-            problems.append("process")
-        if port and allowed_ports and port not in allowed_ports:
-            problems.append("port")
-        if isinstance(disk, (int, float)) and disk > max_disk:
-            problems.append("disk")
-        if isinstance(mem, (int, float)) and mem > max_mem:
-            problems.append("memory")
+def _minute_series(agent_id: str, agent_df: Any) -> Any:
+    # statsforecast models need a regular series: per-minute means, gaps interpolated
+    series = agent_df.set_index("ds")["y"].resample("min").mean().interpolate().reset_index()
+    series.insert(0, "unique_id", agent_id)
+    return series
+
+
+def _statsforecast(series: Any, model: Any) -> Tuple[Any, Any]:
+    # One series per call, so worker processes (n_jobs) would only add overhead
+    sf = StatsForecast(models=[model], freq="min", n_jobs=1)
+    forecast = sf.forecast(df=series, h=SETTINGS.FORECAST_PERIODS_MIN)
+    if "unique_id" not in forecast.columns:
+        forecast = forecast.reset_index()  # older releases index by unique_id
+    return sf, forecast.rename(columns={str(model): "yhat"})
+
+
+def fit_statsforecast(agent_id: str, agent_df: Any) -> Tuple[Any, Any]:
+    return _statsforecast(_minute_series(agent_id, agent_df), AutoARIMA(season_length=1))
+
+
+def fit_ets(agent_id: str, agent_df: Any) -> Tuple[Any, Any]:
+    series = _minute_series(agent_id, agent_df)
+    # A seasonal model needs two full seasons of history
+    season = SETTINGS.ETS_SEASON_LENGTH if len(series) >= 2 * SETTINGS.ETS_SEASON_LENGTH else 1
+    return _statsforecast(series, AutoETS(season_length=season))
+
+
+def fit_neuralprophet(agent_id: str, agent_df: Any) -> Tuple[Any, Any]:
+    series = agent_df.set_index("ds")["y"].resample("min").mean().interpolate().reset_index()
+    series["y"] = series["y"].astype("float32")
+    model = NeuralProphet(epochs=20)
+    model.fit(series, freq="min", minimal=True)
+    future = model.make_future_dataframe(series, periods=SETTINGS.FORECAST_PERIODS_MIN)
+    forecast = model.predict(future)
+    return model, forecast.rename(columns={"yhat1": "yhat"})
+
+
+FORECASTERS = {
+    "ets": fit_ets,
+    "prophet": fit_prophet,
+    "neuralprophet": fit_neuralprophet,
+    "statsforecast": fit_statsforecast,
+}
+
+
+def run_forecaster(engine: str, agent_id: str, agent_df: Any) -> Dict[str, Any]:
+    """
+    Fits `engine` on an agent's history and renders the forecast. Top-level and
+    free of shared state so it can run in a worker process.
+    """
+    _, forecast = FORECASTERS[engine](agent_id, agent_df)
+    return _forecast_result(forecast)
+
+
+def cached_forecast(agent_id: str) -> Optional[Dict[str, Any]]:
+    # Fitting is the expensive part; skip it (and predict) while the agent's
+    # history has not moved, or has grown by fewer than PROPHET_REFIT_MIN_ROWS
+    # rows since the last fit.
+    with agent_history_lock:
+        total = agent_history_rows.get(agent_id, 0)
+        history = agent_history.get(agent_id)
+        last_ds = history[-1][0] if history else None
+    with _forecast_cache_lock:
+        cached = _forecast_cache.get(agent_id)
+    if cached and (cached["last_ds"] == last_ds or total - cached["rows"] < SETTINGS.PROPHET_REFIT_MIN_ROWS):
+        return cached["result"]
+    return None
+
+
+def store_forecast(agent_id: str, result: Dict[str, Any], rows: int, last_ds: Any) -> None:
+    with _forecast_cache_lock:
+        _forecast_cache[agent_id] = {"result": result, "rows": rows, "last_ds": last_ds}
+
+
+# Shared keep-alive client so Groq calls reuse one TLS connection; opened on
+# startup when Groq is enabled.
+_groq_client: Optional[httpx.AsyncClient] = None
+
+
+def create_groq_client() -> httpx.AsyncClient:
+    # HTTP/2 multiplexes concurrent verdict requests over one pooled connection
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=SETTINGS.GROQ_TIMEOUT,
+        limits=httpx.Limits(max_keepalive_connections=SETTINGS.GROQ_MAX_KEEPALIVE),
+        headers={"Authorization": f"Bearer {SETTINGS.GROQ_API_KEY}", "Content-Type": "application/json"},
+    )
+
+
+# LRU of Groq verdicts keyed by a hash of the key-sorted (baseline, event) JSON;
+# only touched from the event loop.
+_groq_cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+
+
+GROQ_SYSTEM_PROMPT = """
+    You are a network security analyst. Compare the new event to the baseline.
+    Respond ONLY as JSON:
+    {"is_anomaly": boolean, "problematic_fields": ["field1", ...], "suggestion": "brief action"}
+    """
+
+
+def encode_baseline(baseline: Dict[str, Any]) -> bytes:
+    return orjson.dumps(baseline, option=orjson.OPT_SORT_KEYS)
+
+
+class BaselineRules(NamedTuple):
+    procs: FrozenSet[Any]
+    ports: FrozenSet[Any]
+    max_disk: float
+    max_mem: float
+
+
+def baseline_rules(baseline: Dict[str, Any]) -> BaselineRules:
+    return BaselineRules(
+        frozenset(baseline.get("allowed_processes", [])),
+        frozenset(baseline.get("allowed_ports", [])),
+        baseline.get("allowed_disk_usage", 90),
+        baseline.get("allowed_memory", 95),
+    )
+
 
+# Bit per baseline check, in the order fields are reported
+VIOLATION_FIELDS = ("process", "port", "disk", "memory")
+
+
+def baseline_violations(rules: BaselineRules, event: Dict[str, Any]) -> int:
+    """Bitmask of VIOLATION_FIELDS the event falls outside of; 0 when clean."""
+    proc = event.get("process")
+    port = event.get("port")
+    disk = event.get("disk")
+    mem = event.get("memory")
+    return (
+        (bool(proc and rules.procs and proc not in rules.procs))
+        | (bool(port and rules.ports and port not in rules.ports) << 1)
+        | ((isinstance(disk, (int, float)) and disk > rules.max_disk) << 2)
+        | ((isinstance(mem, (int, float)) and mem > rules.max_mem) << 3)
+    )
+
+
+def check_baseline(rules: BaselineRules, event: Dict[str, Any]) -> List[str]:
+    """Names of the event fields that fall outside the baseline."""
+    mask = baseline_violations(rules, event)
+    return [field for bit, field in enumerate(VIOLATION_FIELDS) if mask >> bit & 1] if mask else []
+
+
+async def analyze_with_groq(
+    baseline: Dict[str, Any],
+    event: Dict[str, Any],
+    baseline_json: Optional[bytes] = None,
+    rules: Optional[BaselineRules] = None,
+) -> Dict[str, Any]:
+    """
+    `baseline_json` and `rules` are the pre-encoded baseline and its prepared
+    checks (see agent_baselines_json / agent_baseline_rules); they are built
+    here when not given.
+    """
+    def local_rules() -> Dict[str, Any]:
+        problems = check_baseline(rules or baseline_rules(baseline), event)
         return {
             "is_anomaly": bool(problems),
             "problematic_fields": problems,
@@ -309,136 +913,343 @@ def analyze_with_groq(baseline: Dict[str, Any], event: Dict[str, Any]) -> Dict[s
             "engine": "local",
         }
 
-    if not (SETTINGS.ENABLE_GROQ and SETTINGS.GROQ_API_KEY):
+    if not (SETTINGS.ENABLE_GROQ and SETTINGS.GROQ_API_KEY) or _groq_client is None:
         return local_rules()
 
-    headers = {"Authorization": f"Bearer {SETTINGS.GROQ_API_KEY}", "Content-Type": "application/json"}
-    system_prompt = """
-    You are a network security analyst. Compare the new event to the baseline.
-    Respond ONLY as JSON:
-    {"is_anomaly": boolean, "problematic_fields": ["field1", ...], "suggestion": "brief action"}
-    """
-    user_prompt = f"Baseline: {json.dumps(baseline)}\nEvent: {json.dumps(event)}"
+    try:
+        if baseline_json is None:
+            baseline_json = encode_baseline(baseline)
+        event_json = orjson.dumps(event, option=orjson.OPT_SORT_KEYS)
+    except Exception as e:
+        fb = local_rules()
+        fb["error"] = str(e)
+        return fb
+    key = hashlib.blake2b(baseline_json + b"\0" + event_json, digest_size=16).digest()
+    if key in _groq_cache:
+        _groq_cache.move_to_end(key)
+        return dict(_groq_cache[key])
+
+    user_prompt = (b"Baseline: " + baseline_json + b"\nEvent: " + event_json).decode()
     body = {
         "model": SETTINGS.GROQ_MODEL,
-        "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+        "messages": [{"role": "system", "content": GROQ_SYSTEM_PROMPT}, {"role": "user", "content": user_prompt}],
         "temperature": 0.1,
         "max_tokens": 512,
         "response_format": {"type": "json_object"},
     }
     try:
-        resp = requests.post(SETTINGS.GROQ_API_URL, json=body, headers=headers, timeout=SETTINGS.GROQ_TIMEOUT)
+        resp = await _groq_client.post(SETTINGS.GROQ_API_URL, content=orjson.dumps(body))
         resp.raise_for_status()
-        content = resp.json()["choices"][0]["message"]["content"]
-        parsed = json.loads(content)
+        content = orjson.loads(resp.content)["choices"][0]["message"]["content"]
+        parsed = orjson.loads(content)
         parsed["engine"] = "groq"
-        return parsed
+        if SETTINGS.GROQ_CACHE_SIZE > 0:
+            _groq_cache[key] = parsed
+            if len(_groq_cache) > SETTINGS.GROQ_CACHE_SIZE:
+                _groq_cache.popitem(last=False)
+        return dict(parsed)
     except Exception as e:
         fb = local_rules()
         fb["error"] = str(e)
         return fb
 
 
-def guardian_logic() -> None:
-    while not stop_event.is_set():
-        time.sleep(3)
+AgentSplit = Tuple[List[str], List[Tuple[str, Dict[str, Any]]], List[Tuple[str, Dict[str, Any]]]]
+
+
+def classify_agents(agents: Tuple[Tuple[str, Dict[str, Any]], ...], cutoff: float) -> AgentSplit:
+    """Splits a snapshot into (expired ids, busy, idle) by pressure score."""
+    busy_agents: List[Tuple[str, Dict[str, Any]]] = []
+    idle_agents: List[Tuple[str, Dict[str, Any]]] = []
+    busy_thresh = SETTINGS.PRESSURE_BUSY
+    idle_thresh = SETTINGS.PRESSURE_IDLE
+    to_remove: List[str] = []
+
+    for agent_id, rec in agents:
+        if rec.get("last_seen_epoch", 0.0) < cutoff:
+            to_remove.append(agent_id)
+            continue
+
+        # Read metrics (default to 0.0 if missing)
+        cpu = float(rec.get("cpu", 0.0))
+        mem = float(rec.get("memory", 0.0))
+        wl  = float(rec.get("workload", 0.0))
+
+        # Pressure score (tunable: 60% CPU, 30% Memory, 10% Workload)
+        pressure = 0.6 * cpu + 0.3 * mem + 0.1 * wl
+
+        if pressure >= busy_thresh:
+            busy_agents.append((agent_id, rec))
+        elif pressure <= idle_thresh:
+            idle_agents.append((agent_id, rec))
+    return to_remove, busy_agents, idle_agents
+
+
+def classify_agents_np(agents: Tuple[Tuple[str, Dict[str, Any]], ...], cutoff: float) -> AgentSplit:
+    """classify_agents with the pressure score and masks computed as arrays."""
+    n = len(agents)
+    recs = [rec for _, rec in agents]
+    cpu = np.fromiter((rec.get("cpu", 0.0) for rec in recs), dtype=np.float64, count=n)
+    mem = np.fromiter((rec.get("memory", 0.0) for rec in recs), dtype=np.float64, count=n)
+    wl = np.fromiter((rec.get("workload", 0.0) for rec in recs), dtype=np.float64, count=n)
+    seen = np.fromiter((rec.get("last_seen_epoch", 0.0) for rec in recs), dtype=np.float64, count=n)
+
+    pressure = 0.6 * cpu + 0.3 * mem + 0.1 * wl
+    live = seen >= cutoff
+    busy = live & (pressure >= SETTINGS.PRESSURE_BUSY)
+    idle = live & ~busy & (pressure <= SETTINGS.PRESSURE_IDLE)
+    return (
+        [agents[i][0] for i in np.flatnonzero(~live)],
+        [agents[i] for i in np.flatnonzero(busy)],
+        [agents[i] for i in np.flatnonzero(idle)],
+    )
+
+
+def guardian_pass() -> None:
+    global _agent_data_version
+    agents = tuple(agent_snapshot().items())
+    if not agents:
+        return
+
+    # last_seen_epoch is stored at report time, so expiry is one compare
+    cutoff = time.time() - SETTINGS.AGENT_TIMEOUT_SEC
+    if np is not None:
+        to_remove, busy_agents, idle_agents = classify_agents_np(agents, cutoff)
+    else:
+        to_remove, busy_agents, idle_agents = classify_agents(agents, cutoff)
+
+    if to_remove:
+        removed = []
         with agent_data_lock:
-            if not agent_data:
-                continue
+            for aid in to_remove:
+                # Skip agents that reported again since the snapshot
+                rec = agent_data.get(aid)
+                if rec is not None and rec.get("last_seen_epoch", 0.0) < cutoff:
+                    del agent_data[aid]
+                    removed.append(aid)
+            if removed:
+                _agent_data_version += 1
+        for aid in removed:
+            sse_publish("agent_offline", {"agent_id": aid, "at": now_str()})
+
+    if busy_agents and idle_agents:
+        busy_id, busy_rec = busy_agents[0]
+        idle_id, idle_rec = idle_agents[0]
+        busy_cpu = float(busy_rec.get("cpu", 0.0))
+        idle_cpu = float(idle_rec.get("cpu", 0.0))
+        workload = int(busy_rec.get("workload", 0))
+        action = {
+            "id": f"{busy_id}_to_{idle_id}_{int(time.time())}",
+            "type": "offload",
+            "sourceDevice": busy_id,
+            "targetDevice": idle_id,
+            "status": "active",
+            "estimatedBenefit": round(busy_cpu - idle_cpu, 2),
+            "workloadAmount": workload,
+            "timestamp": now_str(),
+        }
+        append_load_balancing_action(action)
 
-            busy_agents: List[str] = []
-            idle_agents: List[str] = []
-            now_epoch = time.time()
-            to_remove: List[str] = []
 
-            for agent_id, rec in agent_data.items():
-                last_seen_epoch = rec.get("last_seen_epoch", 0.0)
-                if now_epoch - float(last_seen_epoch) > SETTINGS.AGENT_TIMEOUT_SEC:
-                    to_remove.append(agent_id)
-                    continue
+async def guardian_logic() -> None:
+    while not stop_event.is_set():
+        await asyncio.sleep(3)
+        # An uncaught error would end the task silently; log it and keep going
+        try:
+            guardian_pass()
+        except Exception:
+            logger.exception("Guardian pass failed")
+
+
+def _baseline_from_events(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    processes = [e.get("process") for e in events if "process" in e]
+    ports = [e.get("port") for e in events if "port" in e]
+    disk_usages = [e.get("disk") for e in events if isinstance(e.get("disk"), (int, float))]
+    memory_usages = [e.get("memory") for e in events if isinstance(e.get("memory"), (int, float))]
+    return {
+        "allowed_processes": list(Counter([p for p in processes if p]).keys()),
+        "allowed_ports": list(Counter([p for p in ports if p is not None]).keys()),
+        "allowed_disk_usage": max(disk_usages) if disk_usages else 90,
+        "allowed_memory": max(memory_usages) if memory_usages else 95,
+    }
+
+
+def compute_baselines(events: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-agent baselines from raw event envelopes: distinct processes/ports in
+    first-seen order and the max disk/memory seen. One pandas groupby when
+    pandas is available, a per-agent Python pass otherwise.
+    """
+    if pd is None:
+        events_by_agent: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for e in events:
+            aid = e.get("agent_id")
+            if aid:
+                events_by_agent[aid].append(e.get("event") or {})
+        return {aid: _baseline_from_events(evts) for aid, evts in events_by_agent.items()}
+
+    rows = [
+        (e.get("agent_id"), ev.get("process"), ev.get("port"), ev.get("disk"), ev.get("memory"))
+        for e in events
+        if e.get("agent_id")
+        for ev in (e.get("event") or {},)
+    ]
+    if not rows:
+        return {}
+    # object dtype keeps ports as ints instead of NaN-padded floats
+    df = pd.DataFrame(rows, columns=["agent_id", "process", "port", "disk", "memory"], dtype=object)
+    df["disk"] = pd.to_numeric(df["disk"], errors="coerce")
+    df["memory"] = pd.to_numeric(df["memory"], errors="coerce")
+
+    # One pass per aggregate over the whole frame; the results are turned into
+    # plain dicts so assembling the baselines is dict lookups only.
+    maxes = df.groupby("agent_id", sort=False)[["disk", "memory"]].max()
+    procs = df[df["process"].notna() & df["process"].astype(bool)].groupby("agent_id", sort=False)["process"].unique().to_dict()
+    ports = df[df["port"].notna()].groupby("agent_id", sort=False)["port"].unique().to_dict()
+
+    baselines: Dict[str, Dict[str, Any]] = {}
+    for aid, disk, memory in maxes.itertuples(name=None):
+        baselines[aid] = {
+            "allowed_processes": procs[aid].tolist() if aid in procs else [],
+            "allowed_ports": ports[aid].tolist() if aid in ports else [],
+            "allowed_disk_usage": float(disk) if disk == disk else 90,  # NaN when no numeric sample
+            "allowed_memory": float(memory) if memory == memory else 95,
+        }
+    return baselines
 
-                # Read metrics (default to 0.0 if missing)
-                cpu = float(rec.get("cpu", 0.0))
-                mem = float(rec.get("memory", 0.0))
-                wl  = float(rec.get("workload", 0.0))
 
-                # Pressure score (tunable: 60% CPU, 30% Memory, 10% Workload)
-                pressure = 0.6 * cpu + 0.3 * mem + 0.1 * wl
+async def update_baselines() -> None:
+    while not stop_event.is_set():
+        await asyncio.sleep(SETTINGS.BASELINE_UPDATE_INTERVAL_SEC)
+        try:
+            await refresh_baselines()
+        except Exception:
+            logger.exception("Baseline update failed")
 
-                busy_thresh = SETTINGS.PRESSURE_BUSY
-                idle_thresh = SETTINGS.PRESSURE_IDLE
 
-                if pressure >= busy_thresh:
-                    busy_agents.append(agent_id)
-                elif pressure <= idle_thresh:
-                    idle_agents.append(agent_id)
+async def refresh_baselines() -> None:
+    with tetragon_lock:
+        events = list(tetragon_events)
+    baselines = await asyncio.to_thread(compute_baselines, events)
 
-            for aid in to_remove:
-                agent_data.pop(aid, None)
-                sse_publish("agent_offline", {"agent_id": aid, "at": now_str()})
-
-        if busy_agents and idle_agents:
-            busy_id = busy_agents[0]
-            idle_id = idle_agents[0]
-            with agent_data_lock:
-                busy_cpu = float(agent_data.get(busy_id, {}).get("cpu", 0.0))
-                idle_cpu = float(agent_data.get(idle_id, {}).get("cpu", 0.0))
-                workload = int(agent_data.get(busy_id, {}).get("workload", 0))
-            action = {
-                "id": f"{busy_id}_to_{idle_id}_{int(time.time())}",
-                "type": "offload",
-                "sourceDevice": busy_id,
-                "targetDevice": idle_id,
-                "status": "active",
-                "estimatedBenefit": round(busy_cpu - idle_cpu, 2),
-                "workloadAmount": workload,
-                "timestamp": now_str(),
-            }
-            append_load_balancing_action(action)
+    updated = []
+    with baseline_lock:
+        for agent_id, baseline in baselines.items():
+            agent_baselines[agent_id] = baseline
+            agent_baselines_json[agent_id] = encode_baseline(baseline)
+            agent_baseline_rules[agent_id] = baseline_rules(baseline)
+            updated.append({"agent_id": agent_id, "baseline": baseline})
+    if updated:
+        sse_publish("baseline_update", {"updated": updated})
+
+
+_forecast_pool: Optional[ProcessPoolExecutor] = None
 
 
-def update_baselines() -> None:
+def get_forecast_pool() -> ProcessPoolExecutor:
+    global _forecast_pool
+    if _forecast_pool is None:
+        _forecast_pool = ProcessPoolExecutor(max_workers=max(1, SETTINGS.FORECAST_WORKERS))
+    return _forecast_pool
+
+
+def forecast_done(agent_id: str, future: Future, rows: int, last_ds: Any) -> None:
+    """
+    Done-callback of a submitted fit: caches its result even when it finishes
+    after forecast_agents stopped waiting for it.
+    """
+    with _forecast_cache_lock:
+        if _forecast_inflight.get(agent_id) is future:
+            del _forecast_inflight[agent_id]
+    if future.cancelled():  # pool shut down before the fit started
+        return
+    try:
+        result = future.result()
+    except Exception as e:
+        logger.warning("Forecast for %s failed: %s", agent_id, e)
+        return
+    store_forecast(agent_id, result, rows, last_ds)
+
+
+def forecast_agents(agent_ids: Tuple[str, ...], timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Forecasts for several agents: fresh ones from the cache, stale ones refit
+    one agent per worker process. History frames are built here and shipped to
+    the workers, which hold no dashboard state. Fits still running after
+    `timeout` seconds are reported as errors; they finish in the background,
+    fill the cache (see forecast_done) and are not resubmitted meanwhile.
+    """
+    if FORECAST_ENGINE not in FORECASTERS:
+        return {aid: naive_forecast(aid) for aid in agent_ids}
+    results: Dict[str, Any] = {}
+    jobs = {}
+    for aid in agent_ids:
+        cached = cached_forecast(aid)
+        if cached is not None:
+            results[aid] = cached
+            continue
+        agent_df, total = agent_history_frame(aid)
+        if len(agent_df) < 5:
+            results[aid] = {"error": "Not enough historical data."}
+            continue
+        jobs[aid] = (agent_df, total, agent_df["ds"].iloc[-1])
+
+    if jobs:
+        pool = get_forecast_pool()
+        futures: Dict[Future, str] = {}
+        submitted = []
+        with _forecast_cache_lock:
+            for aid, (agent_df, total, last_ds) in jobs.items():
+                future = _forecast_inflight.get(aid)
+                if future is None:
+                    future = pool.submit(run_forecaster, FORECAST_ENGINE, aid, agent_df)
+                    _forecast_inflight[aid] = future
+                    submitted.append((aid, future, total, last_ds))
+                futures[future] = aid
+        # Outside the lock: a fit that already finished runs its callback here
+        for aid, future, total, last_ds in submitted:
+            future.add_done_callback(
+                lambda f, aid=aid, total=total, last_ds=last_ds: forecast_done(aid, f, total, last_ds)
+            )
+        done, not_done = wait(futures, timeout=timeout)
+        for future in not_done:
+            results[futures[future]] = {"error": "Forecast timed out."}
+        for future in done:
+            if future.cancelled():
+                results[futures[future]] = {"error": "Forecast cancelled."}
+                continue
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = {"error": str(e)}
+    return {aid: results[aid] for aid in agent_ids}
+
+
+async def summary_publisher() -> None:
+    """Refreshes the summary and pushes it to SSE subscribers at a fixed rate."""
     while not stop_event.is_set():
-        time.sleep(SETTINGS.BASELINE_UPDATE_INTERVAL_SEC)
-        events_by_agent: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-        with tetragon_lock:
-            for e in tetragon_events:
-                aid = e.get("agent_id")
-                if aid:
-                    events_by_agent[aid].append(e.get("event", {}))
-
-        updated = []
-        with baseline_lock:
-            for agent_id, events in events_by_agent.items():
-                processes = [e.get("process") for e in events if "process" in e]
-                ports = [e.get("port") for e in events if "port" in e]
-                disk_usages = [e.get("disk") for e in events if isinstance(e.get("disk"), (int, float))]
-                memory_usages = [e.get("memory") for e in events if isinstance(e.get("memory"), (int, float))]
-
-                allowed_processes = list(Counter([p for p in processes if p]).keys())
-                allowed_ports = list(Counter([p for p in ports if p is not None]).keys())
-                allowed_disk_usage = max(disk_usages) if disk_usages else 90
-                allowed_memory = max(memory_usages) if memory_usages else 95
-
-                agent_baselines[agent_id] = {
-                    "allowed_processes": allowed_processes,
-                    "allowed_ports": allowed_ports,
-                    "allowed_disk_usage": allowed_disk_usage,
-                    "allowed_memory": allowed_memory,
-                }
-                updated.append({"agent_id": agent_id, "baseline": agent_baselines[agent_id]})
-        if updated:
-            sse_publish("baseline_update", {"updated": updated})
-        sse_publish("summary", build_summary())
+        try:
+            summary = compute_summary()
+            with _summary_lock:
+                _summary_cache["value"] = summary
+                _summary_cache["t"] = time.monotonic()
+            sse_publish("summary", summary)
+        except Exception:
+            logger.exception("Summary refresh failed")
+        await asyncio.sleep(SETTINGS.SUMMARY_INTERVAL_SEC)
 
 
-def prediction_service_loop() -> None:
+async def prediction_service_loop() -> None:
     while not stop_event.is_set():
-        with agent_data_lock:
-            active_agents = list(agent_data.keys())
-        for aid in active_agents:
-            train_and_predict(aid, return_forecast=False)
-        time.sleep(SETTINGS.PREDICTION_INTERVAL_SEC)
+        active_agents = tuple(agent_snapshot())
+        # Waits on the process pool, so keep it off the event loop; a cycle
+        # never waits on slow fits past the next one
+        timeout = max(1.0, SETTINGS.PREDICTION_INTERVAL_SEC - 5)
+        try:
+            await asyncio.to_thread(forecast_agents, active_agents, timeout)
+        except Exception:
+            logger.exception("Prediction cycle failed")
+        await asyncio.sleep(SETTINGS.PREDICTION_INTERVAL_SEC)
 
 
 @app.get("/health")
@@ -448,8 +1259,7 @@ def health() -> Dict[str, str]:
 
 @app.get("/api/status")
 def get_status() -> Dict[str, Any]:
-    with agent_data_lock:
-        return agent_data
+    return agent_snapshot()
 
 
 @app.get("/api/load_balancing")
@@ -463,8 +1273,30 @@ def get_summary() -> Dict[str, Any]:
     return build_summary()
 
 
+def parquet_history_as_csv():
+    """
+    Converts the parquet dataset to the CSV layout of metrics_history.csv,
+    one record batch at a time.
+    """
+    dataset = pa_ds.dataset(SETTINGS.METRICS_HISTORY_PARQUET, format="parquet", partitioning=PARQUET_PARTITIONING)
+    header = True
+    for batch in dataset.to_batches(columns=CSV_HEADERS):
+        df = batch.to_pandas()
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ns")
+        yield df.to_csv(index=False, header=header, date_format="%Y-%m-%d %H:%M:%S")
+        header = False
+    if header:
+        yield ",".join(CSV_HEADERS) + "\n"
+
+
 @app.get("/metrics_history.csv")
 def get_metrics_csv():
+    if USE_PARQUET:
+        flush_metrics_parquet()
+        if not os.path.exists(SETTINGS.METRICS_HISTORY_PARQUET):
+            raise HTTPException(status_code=404, detail="No metrics history available.")
+        return StreamingResponse(parquet_history_as_csv(), media_type="text/csv")
+    flush_metrics_csv()
     if not os.path.exists(SETTINGS.METRICS_HISTORY_FILE):
         raise HTTPException(status_code=404, detail="No metrics history available.")
     return FileResponse(SETTINGS.METRICS_HISTORY_FILE, media_type="text/csv")
@@ -476,18 +1308,18 @@ async def sse_stream():
     Server-Sent Events stream for real-time updates.
     Sends an initial snapshot + incremental updates.
     """
-    q: asyncio.Queue = asyncio.Queue()
-    sse_subscribe(q)
+    sub = SSESubscriber()
+    q = sub.queue
+    sse_subscribe(sub)
 
     async def event_gen():
         try:
             # Initial snapshot
-            with agent_data_lock:
-                snapshot_agents = dict(agent_data)
+            snapshot_agents = agent_snapshot()
             with actions_lock:
-                snapshot_actions = list(load_balancing_actions)[-5:]
+                snapshot_actions = tail(load_balancing_actions, 5)
             with recent_anomalies_lock:
-                snapshot_anomalies = list(recent_anomalies)[-5:]
+                snapshot_anomalies = tail(recent_anomalies, 5)
             initial = {
                 "type": "snapshot",
                 "time": now_str(),
@@ -498,27 +1330,48 @@ async def sse_stream():
                     "summary": build_summary(),
                 },
             }
-            yield f"data: {json.dumps(initial)}\n\n"
+            yield b"data: " + orjson.dumps(initial) + b"\n\n"
 
+            loop = asyncio.get_running_loop()
+            window = SETTINGS.SSE_BATCH_WINDOW_MS / 1000
             while True:
                 try:
-                    item = await asyncio.wait_for(q.get(), timeout=15)
-                    yield f"data: {json.dumps(item)}\n\n"
+                    frame, urgent = await asyncio.wait_for(q.get(), timeout=15)
                 except asyncio.TimeoutError:
                     # Keep-alive comment for proxies/clients
-                    yield ": keep-alive\n\n"
+                    yield b": keep-alive\n\n"
+                    continue
+                # Collect whatever else arrives within the window and send it
+                # as one chunk; the client still sees one data frame per message.
+                frames = [frame]
+                deadline = loop.time() + window
+                while not urgent:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        frame, urgent = await asyncio.wait_for(q.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    frames.append(frame)
+                yield b"".join(frames)
+                if sub.dropped:
+                    break
         finally:
-            sse_unsubscribe(q)
+            sse_unsubscribe(sub)
 
     return StreamingResponse(event_gen(), media_type="text/event-stream")
 
 
-@app.post("/api/report")
-async def receive_report(request: Request):
-    data = await request.json()
+async def read_json(request: Request) -> Any:
+    return orjson.loads(await request.body())
+
+
+def ingest_report(data: Dict[str, Any]) -> bool:
+    global _agent_data_version
     agent_id = data.get("agent_id")
     if not agent_id:
-        return JSONResponse({"status": "error", "message": "Missing agent_id"}, status_code=400)
+        return False
 
     record = dict(data)
     record["last_seen"] = now_str()
@@ -526,24 +1379,32 @@ async def receive_report(request: Request):
 
     with agent_data_lock:
         agent_data[agent_id] = record
+        _agent_data_version += 1
 
-    log_metric_to_csv({"agent_id": agent_id, **data})
+    now_dt = datetime.now()
+    log_metric({"agent_id": agent_id, **data}, now_dt, record["last_seen"])
+    append_agent_history(agent_id, now_dt, data.get("cpu"))
     sse_publish("agent_update", {"agent_id": agent_id, "metrics": record})
-    sse_publish("summary", build_summary())
-    return JSONResponse({"status": "success", "message": f"Data received from {agent_id}"})
+    return True
 
 
-@app.post("/api/event")
-async def receive_event(request: Request):
-    event_data_full = await request.json()
+async def ingest_event(event_data_full: Dict[str, Any]) -> Dict[str, Any]:
     push_tetragon_event(event_data_full)
 
     agent_id = event_data_full.get("agent_id")
     new_event = event_data_full.get("event", {}) or {}
     with baseline_lock:
-        baseline = agent_baselines.get(agent_id) or event_data_full.get("baseline", {}) or {}
-
-    structured = analyze_with_groq(baseline, new_event)
+        baseline = agent_baselines.get(agent_id)
+        baseline_json = agent_baselines_json.get(agent_id) if baseline else None
+        rules = agent_baseline_rules.get(agent_id) if baseline else None
+    if not baseline:
+        baseline = event_data_full.get("baseline", {}) or {}
+
+    # Events inside a learned baseline are clean; skip Groq for them
+    if rules is not None and not baseline_violations(rules, new_event):
+        structured = {"is_anomaly": False, "problematic_fields": [], "suggestion": "", "engine": "fastpath"}
+    else:
+        structured = await analyze_with_groq(baseline, new_event, baseline_json, rules)
     resp = {
         "agent_id": agent_id,
         "baseline_data": baseline,
@@ -553,33 +1414,141 @@ async def receive_event(request: Request):
     sse_publish("event", resp)
     if structured.get("is_anomaly"):
         record_anomaly({"agent_id": agent_id, "event": new_event, "analysis": structured, "time": now_str()})
-    sse_publish("summary", build_summary())
-    return JSONResponse(resp)
+    return resp
+
+
+def _batch_items(body: Any) -> Optional[List[Dict[str, Any]]]:
+    batch = body.get("batch") if isinstance(body, dict) else None
+    if not isinstance(batch, list):
+        return None
+    return [item for item in batch if isinstance(item, dict)]
+
+
+@app.post("/api/report")
+async def receive_report(request: Request):
+    data = await read_json(request)
+    agent_id = data.get("agent_id")
+    if not ingest_report(data):
+        return ORJSONResponse({"status": "error", "message": "Missing agent_id"}, status_code=400)
+    return ORJSONResponse({"status": "success", "message": f"Data received from {agent_id}"})
+
+
+@app.post("/api/report_batch")
+async def receive_report_batch(request: Request):
+    """
+    Bulk /api/report used by agents replaying their offline buffer.
+    Body: {"agent_id": "<sender>", "batch": [<report>, ...]}
+    """
+    items = _batch_items(await read_json(request))
+    if items is None:
+        return ORJSONResponse({"status": "error", "message": "Missing batch"}, status_code=400)
+    accepted = sum(1 for item in items if ingest_report(item))
+    return ORJSONResponse({"status": "success", "accepted": accepted, "rejected": len(items) - accepted})
+
+
+@app.post("/api/event")
+async def receive_event(request: Request):
+    resp = await ingest_event(await read_json(request))
+    return ORJSONResponse(resp)
+
+
+@app.post("/api/event_batch")
+async def receive_event_batch(request: Request):
+    """
+    Bulk /api/event used by agents replaying their offline buffer.
+    Body: {"agent_id": "<sender>", "batch": [<event envelope>, ...]}
+    """
+    items = _batch_items(await read_json(request))
+    if items is None:
+        return ORJSONResponse({"status": "error", "message": "Missing batch"}, status_code=400)
+    # Each item may wait on Groq, so analysis runs after the reply: a long
+    # replay must not outlast the agent's request timeout and be re-sent
+    task = asyncio.create_task(ingest_event_batch(items), name="event-batch")
+    _replay_tasks.add(task)
+    task.add_done_callback(_replay_tasks.discard)
+    return ORJSONResponse({"status": "success", "accepted": len(items)})
+
+
+async def ingest_event_batch(items: List[Dict[str, Any]]) -> None:
+    """ingest_event over a replayed batch, EVENT_BATCH_CONCURRENCY at a time."""
+    limit = asyncio.Semaphore(max(1, SETTINGS.EVENT_BATCH_CONCURRENCY))
+
+    async def ingest(item: Dict[str, Any]) -> None:
+        async with limit:
+            try:
+                await ingest_event(item)
+            except Exception as e:
+                logger.error("Replayed event from %s failed: %s", item.get("agent_id"), e)
+
+    await asyncio.gather(*(ingest(item) for item in items))
+
+
+@app.post("/api/telemetry")
+async def receive_telemetry(request: Request):
+    """
+    Report and event from the same agent tick in one request.
+    Body: {"agent_id": "<id>", "report": <report>, "event": <event envelope>}
+    Either part may be omitted, but not both.
+    """
+    body = await read_json(request)
+    report = body.get("report") if isinstance(body, dict) else None
+    event = body.get("event") if isinstance(body, dict) else None
+    if not isinstance(report, dict) and not isinstance(event, dict):
+        return ORJSONResponse({"status": "error", "message": "Missing report and event"}, status_code=422)
+    result: Dict[str, Any] = {"status": "success"}
+    if isinstance(report, dict) and not ingest_report(report):
+        return ORJSONResponse({"status": "error", "message": "Missing agent_id"}, status_code=400)
+    if isinstance(event, dict):
+        result["event"] = await ingest_event(event)
+    return ORJSONResponse(result)
 
 
 @app.post("/api/timeseries")
-def run_timeseries_analysis():
-    with agent_data_lock:
-        active_agents = list(agent_data.keys())
-    results: Dict[str, Any] = {}
-    for agent_id in active_agents:
-        results[agent_id] = train_and_predict(agent_id, return_forecast=True)
+async def run_timeseries_analysis():
+    active_agents = tuple(agent_snapshot())
+    # Fits fan out over the process pool; only the wait happens on a thread
+    results = await asyncio.to_thread(forecast_agents, active_agents)
     payload = {"status": "analysis complete", "results": results}
     sse_publish("prediction", payload)
     return payload
 
 
 @app.on_event("startup")
-def on_startup():
-    global APP_LOOP
-    APP_LOOP = asyncio.get_event_loop()
+async def on_startup():
+    global APP_LOOP, _metrics_writer_thread, _groq_client
+    APP_LOOP = asyncio.get_running_loop()
     logger.info("Dashboard starting up...")
-    threading.Thread(target=guardian_logic, name="guardian", daemon=True).start()
-    threading.Thread(target=update_baselines, name="baseline", daemon=True).start()
-    threading.Thread(target=prediction_service_loop, name="predictor", daemon=True).start()
+    if SETTINGS.ENABLE_GROQ and SETTINGS.GROQ_API_KEY:
+        _groq_client = create_groq_client()
+    warm_agent_history()
+    _metrics_writer_thread = threading.Thread(target=metrics_writer_loop, name="metrics-writer", daemon=True)
+    _metrics_writer_thread.start()
+    background_tasks.extend([
+        asyncio.create_task(guardian_logic(), name="guardian"),
+        asyncio.create_task(update_baselines(), name="baseline"),
+        asyncio.create_task(prediction_service_loop(), name="predictor"),
+        asyncio.create_task(summary_publisher(), name="summary"),
+    ])
 
 
 @app.on_event("shutdown")
-def on_shutdown():
+async def on_shutdown():
+    global _groq_client
     logger.info("Dashboard shutting down...")
-    stop_event.set()
\ No newline at end of file
+    stop_event.set()
+    tasks = [*background_tasks, *_replay_tasks]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    background_tasks.clear()
+    if _groq_client is not None:
+        await _groq_client.aclose()
+        _groq_client = None
+    if _metrics_writer_thread is not None:
+        _metrics_queue.put(None)  # write what is queued, then stop
+        await asyncio.to_thread(_metrics_writer_thread.join, 5.0)
+    if _forecast_pool is not None:
+        _forecast_pool.shutdown(wait=False, cancel_futures=True)
+    flush_metrics_csv(close=True)
+    if USE_PARQUET:
+        flush_metrics_parquet()
\ No newline at end of file
@@ -2,23 +2,26 @@
 Adaptive Network Simulator
 - Generates realistic per-agent metrics and security events
 - Supports anomaly injection, retries with backoff, graceful shutdown
-- Air-gapped friendly (no external deps beyond 'requests')
+- Air-gapped friendly (no external deps beyond 'httpx')
 - Fully configurable via environment variables or CLI flags
 
 Run:
   python simulator.py
   python simulator.py --interval 3 --verify-tls false --concurrency per-agent
+  python simulator.py --concurrency asyncio   # one event loop for all agents
 
 Env (overrides defaults):
   SIM_DASHBOARD_URL=http://127.0.0.1:8000/api/report
   SIM_EVENT_URL=http://127.0.0.1:8000/api/event
+  SIM_TELEMETRY_URL=http://127.0.0.1:8000/api/telemetry  # report+event in one POST; empty to disable
   SIM_INTERVAL=5
   SIM_TIMEOUT=5
   SIM_VERIFY_TLS=false
   SIM_MAX_RETRIES=3
   SIM_BACKOFF_BASE=0.75
   SIM_BACKOFF_MAX=5
-  SIM_CONCURRENCY=per-agent   # or single
+  SIM_CONCURRENCY=per-agent   # or single, asyncio
+  SIM_WORKERS=32              # per-agent mode: max threads; agents are sharded across them
   SIM_JITTER=true
   SIM_JITTER_MAX_MS=750
   SIM_ANOMALY_RATE=0.2
@@ -28,34 +31,61 @@ Env (overrides defaults):
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
+import logging
 import os
+import queue
 import random
 import signal
-import string
+import socket
+import sys
 import threading
 import time
-from dataclasses import dataclass, asdict
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, field, replace
+from logging.handlers import QueueHandler, QueueListener
 from typing import Dict, List, Tuple, Optional
 
-import requests
+import httpx
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # single-thread mode falls back to per-agent generate_metrics
+    np = None
+
+# JSON encoder for request bodies; orjson when installed
+try:
+    import orjson  # type: ignore
+    _dumps = orjson.dumps
+except ImportError:
+    def _dumps(payload) -> bytes:
+        return json.dumps(payload, separators=(",", ":")).encode()
 
 
 # ----------------------------
 # Configuration
 # ----------------------------
 
-@dataclass
+# Slotted, immutable records where the interpreter supports it (3.10+)
+_FROZEN = {"frozen": True, "slots": True} if sys.version_info >= (3, 10) else {"frozen": True}
+
+
+@dataclass(**_FROZEN)
 class Settings:
     DASHBOARD_URL: str = os.getenv("SIM_DASHBOARD_URL", "http://127.0.0.1:8000/api/report")
     EVENT_URL: str = os.getenv("SIM_EVENT_URL", "http://127.0.0.1:8000/api/event")
+    # Combined report+event endpoint; falls back to the two URLs above on 404
+    TELEMETRY_URL: str = os.getenv("SIM_TELEMETRY_URL", "http://127.0.0.1:8000/api/telemetry")
     INTERVAL: float = float(os.getenv("SIM_INTERVAL", "5"))  # seconds
     TIMEOUT: float = float(os.getenv("SIM_TIMEOUT", "5"))  # seconds
     VERIFY_TLS: bool = os.getenv("SIM_VERIFY_TLS", "false").lower() == "true"
     MAX_RETRIES: int = int(os.getenv("SIM_MAX_RETRIES", "3"))
     BACKOFF_BASE: float = float(os.getenv("SIM_BACKOFF_BASE", "0.75"))  # seconds
     BACKOFF_MAX: float = float(os.getenv("SIM_BACKOFF_MAX", "5"))  # seconds
-    CONCURRENCY: str = os.getenv("SIM_CONCURRENCY", "per-agent").lower()  # 'per-agent' or 'single'
+    CONCURRENCY: str = os.getenv("SIM_CONCURRENCY", "per-agent").lower()  # 'per-agent', 'single' or 'asyncio'
+    WORKERS: int = int(os.getenv("SIM_WORKERS", "32"))  # thread cap for per-agent mode
     JITTER: bool = os.getenv("SIM_JITTER", "true").lower() == "true"
     JITTER_MAX_MS: int = int(os.getenv("SIM_JITTER_MAX_MS", "750"))
     ANOMALY_RATE: float = float(os.getenv("SIM_ANOMALY_RATE", "0.2"))
@@ -66,30 +96,116 @@ class Settings:
 SETTINGS = Settings()
 
 
+# ----------------------------
+# Logging
+# ----------------------------
+
+# Agent threads only enqueue records; one listener thread writes to stdout,
+# so senders never contend on the stream lock.
+log = logging.getLogger("simulator")
+log.setLevel(logging.INFO)
+log.propagate = False
+_console = logging.StreamHandler()
+_console.setFormatter(logging.Formatter("%(message)s"))
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+log.addHandler(QueueHandler(log_queue))
+log_listener = QueueListener(log_queue, _console)
+log_listener.start()
+
+
 # ----------------------------
 # HTTP session (air-gapped safe)
 # ----------------------------
 
-session = requests.Session()
-session.trust_env = False  # ignore system proxy to avoid accidental egress
+# Per-thread generator for timing jitter (agent data uses agent_rng), so
+# sender threads never contend on the module-level generator's lock
+_tls = threading.local()
+
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def _rng() -> random.Random:
+    rng = getattr(_tls, "rng", None)
+    if rng is None:
+        rng = random.Random(SETTINGS.SEED ^ threading.get_ident() if SETTINGS.SEED is not None else None)
+        _tls.rng = rng
+    return rng
+
+
+# Nagle off so small JSON posts go out at once, TCP keep-alive on so idle
+# pooled connections are not silently dropped between cycles
+SOCKET_OPTIONS = [
+    (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+
+session: Optional[httpx.Client] = None
 
 
-def safe_post_json(url: str, payload: dict) -> bool:
+def transport_options(agent_count: int) -> Dict:
+    """
+    Shared by the sync and async transports. HTTP/2 multiplexes every
+    agent's posts over one TLS connection per host; plain http:// stays on
+    HTTP/1.1, so the keep-alive pool is sized for the agent count and
+    max_connections is left unbounded.
+    """
+    pool = max(32, agent_count * 2)
+    return dict(
+        http2=True,
+        verify=SETTINGS.VERIFY_TLS,
+        limits=httpx.Limits(max_connections=None, max_keepalive_connections=pool),
+        socket_options=SOCKET_OPTIONS,
+    )
+
+
+def configure_session(agent_count: int) -> None:
+    """
+    Builds the shared client. Retries are handled by safe_post_json, so the
+    transport does not retry.
+    """
+    global session
+    session = httpx.Client(
+        transport=httpx.HTTPTransport(**transport_options(agent_count)),
+        timeout=SETTINGS.TIMEOUT,
+        headers=_JSON_HEADERS,
+        trust_env=False,  # ignore system proxy to avoid accidental egress
+    )
+
+
+def close_session() -> None:
+    global session
+    if session is not None:
+        session.close()
+        session = None
+
+
+class EndpointNotFound(Exception):
+    """The dashboard answered 404; retrying the same URL will not help."""
+
+
+def safe_post_json(url: str, body: bytes, raise_not_found: bool = False) -> bool:
     """
     Bounded retry with exponential backoff and jitter.
-    Returns True on success, False otherwise.
+    Returns True on success, False otherwise. With raise_not_found, a 404
+    raises EndpointNotFound instead of being retried.
     """
     for attempt in range(1, SETTINGS.MAX_RETRIES + 1):
         try:
-            resp = session.post(url, json=payload, timeout=SETTINGS.TIMEOUT, verify=SETTINGS.VERIFY_TLS)
+            resp = session.post(url, content=body)
+            if raise_not_found and resp.status_code == 404:
+                raise EndpointNotFound(url)
             resp.raise_for_status()
             return True
+        except EndpointNotFound:
+            raise
         except Exception as e:
             backoff = min(SETTINGS.BACKOFF_BASE * (2 ** (attempt - 1)), SETTINGS.BACKOFF_MAX)
             if SETTINGS.JITTER:
-                backoff += random.uniform(0, SETTINGS.JITTER_MAX_MS / 1000.0)
-            print(f"[WARN] POST attempt {attempt} to {url} failed: {e}. Retrying in {backoff:.2f}s")
-            time.sleep(backoff)
+                backoff += _rng().uniform(0, SETTINGS.JITTER_MAX_MS / 1000.0)
+            log.warning(f"[WARN] POST attempt {attempt} to {url} failed: {e}. Retrying in {backoff:.2f}s")
+            if stop_event.wait(backoff):
+                break
     return False
 
 
@@ -97,7 +213,7 @@ def safe_post_json(url: str, payload: dict) -> bool:
 # Agent model and data generation
 # ----------------------------
 
-@dataclass
+@dataclass(**_FROZEN)
 class Baseline:
     allowed_processes: List[str]
     allowed_ports: List[int]
@@ -105,13 +221,44 @@ class Baseline:
     allowed_memory: float
 
 
-@dataclass
+@dataclass(**_FROZEN)
 class AgentProfile:
     agent_id: str
     normal_cpu_range: Tuple[float, float]
     normal_memory_range: Tuple[float, float]
     normal_disk_range: Tuple[float, float]
     baseline: Baseline
+    # asdict(baseline), built once: baselines never change after load and
+    # asdict deep-copies the lists on every call
+    baseline_dict: Dict = field(init=False, repr=False, compare=False)
+    processes: Tuple[str, ...] = field(init=False, repr=False, compare=False)  # sampled for top process
+    # Range bounds unpacked once for generate_metrics
+    cpu_lo: float = field(init=False, repr=False, compare=False)
+    cpu_hi: float = field(init=False, repr=False, compare=False)
+    cpu_mid: float = field(init=False, repr=False, compare=False)
+    mem_lo: float = field(init=False, repr=False, compare=False)
+    mem_hi: float = field(init=False, repr=False, compare=False)
+    disk_lo: float = field(init=False, repr=False, compare=False)
+    disk_hi: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Frozen: derived fields are set once here, bypassing __setattr__
+        cpu_lo, cpu_hi = (float(v) for v in self.normal_cpu_range)
+        mem_lo, mem_hi = (float(v) for v in self.normal_memory_range)
+        disk_lo, disk_hi = (float(v) for v in self.normal_disk_range)
+        derived = {
+            "baseline_dict": asdict(self.baseline),
+            "processes": tuple(self.baseline.allowed_processes),
+            "cpu_lo": cpu_lo,
+            "cpu_hi": cpu_hi,
+            "cpu_mid": (cpu_lo + cpu_hi) / 2,
+            "mem_lo": mem_lo,
+            "mem_hi": mem_hi,
+            "disk_lo": disk_lo,
+            "disk_hi": disk_hi,
+        }
+        for name, value in derived.items():
+            object.__setattr__(self, name, value)
 
 
 DEFAULT_AGENTS: List[AgentProfile] = [
@@ -175,16 +322,102 @@ def load_agents() -> List[AgentProfile]:
             )
         return agents
     except Exception as e:
-        print(f"[WARN] Invalid SIM_AGENTS_JSON: {e}. Falling back to defaults.")
+        log.warning(f"[WARN] Invalid SIM_AGENTS_JSON: {e}. Falling back to defaults.")
         return DEFAULT_AGENTS
 
 
-def _rand_process_name() -> str:
-    # yields superficially plausible process names
-    prefixes = ["sys", "daemon", "svc", "agent", "update", "telemetry", "health"]
-    core = "".join(random.choices(string.ascii_lowercase, k=random.randint(4, 9)))
-    suffixes = ["", ".exe", ".sh", ".bin", ".py"]
-    return f"{random.choice(prefixes)}_{core}{random.choice(suffixes)}"
+# (epoch second, "%Y-%m-%d %H:%M:%S", "%H:%M:%S"); swapped as one tuple so
+# threads never see a half-updated entry.
+_ts_cache: Tuple[int, str, str] = (0, "", "")
+
+
+def now_strs() -> Tuple[str, str]:
+    """(full timestamp, HH:MM:SS) for the current second, formatted once per second."""
+    global _ts_cache
+    second = int(time.time())
+    cached = _ts_cache
+    if cached[0] != second:
+        lt = time.localtime(second)
+        cached = (second, time.strftime("%Y-%m-%d %H:%M:%S", lt), time.strftime("%H:%M:%S", lt))
+        _ts_cache = cached
+    return cached[1], cached[2]
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def splitmix64(x: int) -> int:
+    """One SplitMix64 step: a well-mixed 64-bit value from any 64-bit input."""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _literal(value) -> bytes:
+    """JSON-encodes a constant for splicing into a %-template."""
+    return _dumps(value).replace(b"%", b"%%")
+
+
+class AgentState:
+    """
+    Mutable per-agent simulation state (profiles are frozen). An agent is only
+    ever driven by one thread (or task), so no locking is needed.
+    """
+
+    __slots__ = ("rng", "last_disk", "sustained_cpu_until", "report_tpl", "event_tpl", "combined_tpl")
+
+    def __init__(self, agent: AgentProfile):
+        # One generator per agent: agents never share RNG state (or its lock)
+        # across threads, and with SIM_SEED each agent's stream is reproducible
+        # no matter how agents are scheduled.
+        if SETTINGS.SEED is None:
+            self.rng = random.Random()
+        else:
+            key = zlib.crc32(agent.agent_id.encode())
+            self.rng = random.Random(splitmix64((SETTINGS.SEED & _MASK64) ^ key))
+        self.last_disk: Optional[float] = None
+        self.sustained_cpu_until: Optional[float] = None
+        # Request bodies as bytes %-templates: the constant parts (agent id,
+        # baseline) are encoded once here and only the values change per tick
+        agent_id = _literal(agent.agent_id)
+        self.report_tpl = (
+            b'{"agent_id":' + agent_id + b',"cpu":%a,"memory":%a,"disk":%a,"top_process":%b,'
+            b'"top_process_cpu":%a,"network_sent":%d,"network_recv":%d,"workload":%d}'
+        )
+        self.event_tpl = b'{"agent_id":' + agent_id + b',"event":%b,"baseline":' + _literal(agent.baseline_dict) + b"}"
+        self.combined_tpl = b'{"agent_id":' + agent_id + b',"report":%b,"event":%b}'
+
+
+_agent_states: Dict[str, AgentState] = {}
+
+
+def agent_state(agent: AgentProfile) -> AgentState:
+    state = _agent_states.get(agent.agent_id)
+    if state is None:
+        state = _agent_states.setdefault(agent.agent_id, AgentState(agent))
+    return state
+
+
+def agent_rng(agent: AgentProfile) -> random.Random:
+    return agent_state(agent).rng
+
+
+_PROC_PREFIXES = ("sys", "daemon", "svc", "agent", "update", "telemetry", "health")
+_PROC_SUFFIXES = ("", ".exe", ".sh", ".bin", ".py")
+
+
+def _rand_process_name(rng: random.Random) -> str:
+    # yields superficially plausible process names; length (4-9) and letters
+    # all come from one 64-bit draw (26**9 * 6 is well below 2**64)
+    n = rng.getrandbits(64)
+    n, extra = divmod(n, 6)
+    chars = []
+    for _ in range(4 + extra):
+        n, c = divmod(n, 26)
+        chars.append(97 + c)
+    core = bytes(chars).decode("ascii")
+    return f"{rng.choice(_PROC_PREFIXES)}_{core}{rng.choice(_PROC_SUFFIXES)}"
 
 
 def generate_metrics(agent: AgentProfile) -> Dict:
@@ -193,24 +426,30 @@ def generate_metrics(agent: AgentProfile) -> Dict:
     - Slightly correlates memory with cpu
     - Disk varies slower
     """
-    cpu = round(random.uniform(*agent.normal_cpu_range), 2)
+    state = agent_state(agent)
+    # Every draw is rng.random() scaled inline: uniform() and randint() are
+    # Python-level wrappers around it (randint via randrange/_randbelow)
+    rand = state.rng.random
+    cpu = round(agent.cpu_lo + rand() * (agent.cpu_hi - agent.cpu_lo), 2)
     # memory follows cpu trend a bit
-    base_mem = random.uniform(*agent.normal_memory_range)
-    memory = round(min(100.0, max(0.0, base_mem + (cpu - sum(agent.normal_cpu_range) / 2) * 0.05)), 2)
-
-    # disk moves slower: last value with tiny delta (keep a per-thread attribute)
-    tlocal = threading.current_thread().__dict__
-    last_disk = tlocal.get("last_disk", random.uniform(*agent.normal_disk_range))
-    drift = random.uniform(-0.8, 0.8)
+    base_mem = agent.mem_lo + rand() * (agent.mem_hi - agent.mem_lo)
+    memory = round(min(100.0, max(0.0, base_mem + (cpu - agent.cpu_mid) * 0.05)), 2)
+
+    # disk moves slower: last value with tiny delta
+    last_disk = state.last_disk
+    if last_disk is None:
+        last_disk = agent.disk_lo + rand() * (agent.disk_hi - agent.disk_lo)
+    drift = rand() * 1.6 - 0.8
     disk = round(min(100.0, max(0.0, last_disk + drift)), 2)
-    tlocal["last_disk"] = disk
+    state.last_disk = disk
 
     # top process: one from baseline
-    process = random.choice(agent.baseline.allowed_processes)
-    top_process_cpu = round(random.uniform(0.0, min(cpu, 10.0)), 2)
+    processes = agent.processes
+    process = processes[int(rand() * len(processes))]
+    top_process_cpu = round(rand() * min(cpu, 10.0), 2)
 
-    network_sent = random.randint(1_000, 50_000)
-    network_recv = random.randint(10_000, 500_000)
+    network_sent = 1_000 + int(rand() * 49_001)
+    network_recv = 10_000 + int(rand() * 490_001)
 
     return {
         "cpu": cpu,
@@ -220,18 +459,68 @@ def generate_metrics(agent: AgentProfile) -> Dict:
         "top_process_cpu": top_process_cpu,
         "network_sent": network_sent,
         "network_recv": network_recv,
-        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": now_strs()[0],
     }
 
 
+class MetricsBatch:
+    """
+    generate_metrics for a fixed list of agents at once: one NumPy draw per
+    channel per cycle instead of ~10 scalar draws per agent. Same
+    distributions and correlations; disk drift is tracked per agent.
+    """
+
+    def __init__(self, agents: List[AgentProfile], seed: Optional[int]):
+        self.rng = np.random.default_rng(None if seed is None else seed & _MASK64)  # numpy rejects negative seeds
+        self.cpu_lo = np.array([a.cpu_lo for a in agents])
+        self.cpu_hi = np.array([a.cpu_hi for a in agents])
+        self.cpu_mid = np.array([a.cpu_mid for a in agents])
+        self.mem_lo = np.array([a.mem_lo for a in agents])
+        self.mem_hi = np.array([a.mem_hi for a in agents])
+        self.processes = [a.processes for a in agents]
+        self.process_counts = np.array([len(p) for p in self.processes])
+        self.last_disk = self.rng.uniform([a.disk_lo for a in agents], [a.disk_hi for a in agents])
+
+    def generate(self) -> List[Dict]:
+        rng = self.rng
+        n = len(self.processes)
+        cpu = np.round(rng.uniform(self.cpu_lo, self.cpu_hi), 2)
+        memory = np.round(np.clip(rng.uniform(self.mem_lo, self.mem_hi) + (cpu - self.cpu_mid) * 0.05, 0.0, 100.0), 2)
+        disk = np.round(np.clip(self.last_disk + rng.uniform(-0.8, 0.8, n), 0.0, 100.0), 2)
+        self.last_disk = disk
+        process_idx = (rng.random(n) * self.process_counts).astype(np.int64)
+        top_process_cpu = np.round(rng.uniform(0.0, np.minimum(cpu, 10.0)), 2)
+        network_sent = rng.integers(1_000, 50_000, n, endpoint=True)
+        network_recv = rng.integers(10_000, 500_000, n, endpoint=True)
+        timestamp = now_strs()[0]
+        return [
+            {
+                "cpu": c,
+                "memory": m,
+                "disk": d,
+                "process": procs[i],
+                "top_process_cpu": t,
+                "network_sent": ns,
+                "network_recv": nr,
+                "timestamp": timestamp,
+            }
+            for c, m, d, procs, i, t, ns, nr in zip(
+                cpu.tolist(), memory.tolist(), disk.tolist(), self.processes, process_idx.tolist(),
+                top_process_cpu.tolist(), network_sent.tolist(), network_recv.tolist(),
+            )
+        ]
+
+
 def maybe_inject_anomaly(agent: AgentProfile, metrics: Dict) -> Tuple[Dict, Optional[str]]:
     """
     With probability ANOMALY_RATE, inject one of several anomaly types.
     """
-    if random.random() >= SETTINGS.ANOMALY_RATE:
+    state = agent_state(agent)
+    rng = state.rng
+    if rng.random() >= SETTINGS.ANOMALY_RATE:
         return metrics, None
 
-    anomaly_type = random.choice(
+    anomaly_type = rng.choice(
         [
             "cpu_spike",
             "bad_process",
@@ -241,56 +530,81 @@ def maybe_inject_anomaly(agent: AgentProfile, metrics: Dict) -> Tuple[Dict, Opti
             "sustained_high_cpu",
         ]
     )
-    print(f">>> Injecting ANOMALY ({anomaly_type}) for {agent.agent_id} <<<")
+    log.info(f">>> Injecting ANOMALY ({anomaly_type}) for {agent.agent_id} <<<")
 
     if anomaly_type == "cpu_spike":
-        metrics["cpu"] = round(random.uniform(95.0, 99.9), 2)
+        metrics["cpu"] = round(rng.uniform(95.0, 99.9), 2)
     elif anomaly_type == "bad_process":
-        metrics["process"] = _rand_process_name()
+        metrics["process"] = _rand_process_name(rng)
     elif anomaly_type == "disk_full":
-        metrics["disk"] = round(random.uniform(95.0, 99.9), 2)
+        metrics["disk"] = round(rng.uniform(95.0, 99.9), 2)
     elif anomaly_type == "memory_leak":
-        metrics["memory"] = round(random.uniform(92.0, 99.0), 2)
+        metrics["memory"] = round(rng.uniform(92.0, 99.0), 2)
     elif anomaly_type == "suspicious_port":
         # add a port outside baseline for event payload only
-        metrics["port"] = random.choice([22, 25, 8081, 3389, 4444])
+        metrics["port"] = rng.choice([22, 25, 8081, 3389, 4444])
     elif anomaly_type == "sustained_high_cpu":
-        # boost cpu for the next few iterations by setting thread-local state
-        tlocal = threading.current_thread().__dict__
-        tlocal["sustained_cpu_until"] = time.monotonic() + random.uniform(10, 25)
-        metrics["cpu"] = max(metrics["cpu"], random.uniform(85.0, 95.0))
+        # boost cpu for the next few iterations via the agent's state
+        state.sustained_cpu_until = time.monotonic() + rng.uniform(10, 25)
+        metrics["cpu"] = max(metrics["cpu"], rng.uniform(85.0, 95.0))
 
     # If sustained_high_cpu was set, ensure next iterations stay elevated
-    tlocal = threading.current_thread().__dict__
-    until = tlocal.get("sustained_cpu_until")
+    until = state.sustained_cpu_until
     if until and time.monotonic() < until:
-        metrics["cpu"] = max(metrics["cpu"], random.uniform(80.0, 95.0))
+        metrics["cpu"] = max(metrics["cpu"], rng.uniform(80.0, 95.0))
     elif until and time.monotonic() >= until:
-        tlocal.pop("sustained_cpu_until", None)
+        state.sustained_cpu_until = None
 
     return metrics, anomaly_type
 
 
-def build_report_payload(agent: AgentProfile, metrics: Dict) -> Dict:
-    return {
-        "agent_id": agent.agent_id,
-        "cpu": metrics["cpu"],
-        "memory": metrics["memory"],
-        "disk": metrics["disk"],
-        "top_process": metrics["process"],
-        "top_process_cpu": metrics.get("top_process_cpu", 0.0),
-        "network_sent": metrics["network_sent"],
-        "network_recv": metrics["network_recv"],
-        "workload": random.randint(10, 80),
-    }
+# The build_*_payload functions return encoded JSON bodies. Numbers go
+# through %a (repr, which is valid JSON for the finite values generated here);
+# strings and the free-form event dict through _dumps.
+
+def build_report_payload(agent: AgentProfile, metrics: Dict) -> bytes:
+    state = agent_state(agent)
+    return state.report_tpl % (
+        metrics["cpu"],
+        metrics["memory"],
+        metrics["disk"],
+        _dumps(metrics["process"]),
+        metrics.get("top_process_cpu", 0.0),
+        metrics["network_sent"],
+        metrics["network_recv"],
+        state.rng.randint(10, 80),
+    )
 
 
-def build_event_payload(agent: AgentProfile, metrics: Dict) -> Dict:
-    return {
-        "agent_id": agent.agent_id,
-        "event": metrics,
-        "baseline": asdict(agent.baseline),
-    }
+def build_event_payload(agent: AgentProfile, metrics: Dict) -> bytes:
+    return agent_state(agent).event_tpl % _dumps(metrics)
+
+
+def build_combined_payload(agent: AgentProfile, metrics: Dict) -> bytes:
+    report = build_report_payload(agent, metrics)
+    return agent_state(agent).combined_tpl % (report, build_event_payload(agent, metrics))
+
+
+# Cleared the first time the dashboard answers 404 on TELEMETRY_URL
+_telemetry_supported = True
+
+
+def send_tick(agent: AgentProfile, metrics: Dict) -> Tuple[bool, bool]:
+    """
+    Sends one cycle's report and event, in a single POST to TELEMETRY_URL when
+    the dashboard has it. Returns (report_ok, event_ok).
+    """
+    global _telemetry_supported
+    if SETTINGS.TELEMETRY_URL and _telemetry_supported:
+        try:
+            ok = safe_post_json(SETTINGS.TELEMETRY_URL, build_combined_payload(agent, metrics), raise_not_found=True)
+            return ok, ok
+        except EndpointNotFound:
+            log.warning(f"[WARN] {SETTINGS.TELEMETRY_URL} not found; sending reports and events separately")
+            _telemetry_supported = False
+    ok_report = safe_post_json(SETTINGS.DASHBOARD_URL, build_report_payload(agent, metrics))
+    ok_event = safe_post_json(SETTINGS.EVENT_URL, build_event_payload(agent, metrics))
+    return ok_report, ok_event
 
 
 # ----------------------------
@@ -303,62 +617,181 @@ stop_event = threading.Event()
 def _sleep_interval():
     if SETTINGS.JITTER:
         # +/- up to JITTER_MAX_MS/1000 around INTERVAL
-        jitter = random.uniform(-SETTINGS.JITTER_MAX_MS / 1000.0, SETTINGS.JITTER_MAX_MS / 1000.0)
+        jitter = _rng().uniform(-SETTINGS.JITTER_MAX_MS / 1000.0, SETTINGS.JITTER_MAX_MS / 1000.0)
         return max(0.1, SETTINGS.INTERVAL + jitter)
     return SETTINGS.INTERVAL
 
 
 def simulate_agent(agent: AgentProfile):
-    print(f"🛰️  Starting agent simulation: {agent.agent_id}")
+    log.info(f"🛰️  Starting agent simulation: {agent.agent_id}")
     while not stop_event.is_set():
         metrics = generate_metrics(agent)
         metrics, anomaly = maybe_inject_anomaly(agent, metrics)
 
-        # 1) Report metrics
-        report_payload = build_report_payload(agent, metrics)
-        ok_report = safe_post_json(SETTINGS.DASHBOARD_URL, report_payload)
+        # Report metrics and send the event for analysis
+        ok_report, ok_event = send_tick(agent, metrics)
         if ok_report:
-            print(f"[{time.strftime('%H:%M:%S')}] Report sent for {agent.agent_id}")
+            log.info(f"[{now_strs()[1]}] Report sent for {agent.agent_id}")
         else:
-            print(f"[ERROR] Report failed for {agent.agent_id}")
+            log.error(f"[ERROR] Report failed for {agent.agent_id}")
 
-        # 2) Send event for analysis
-        event_payload = build_event_payload(agent, metrics)
-        ok_event = safe_post_json(SETTINGS.EVENT_URL, event_payload)
         if ok_event:
-            print(f"[{time.strftime('%H:%M:%S')}] Event sent for {agent.agent_id}"
+            log.info(f"[{now_strs()[1]}] Event sent for {agent.agent_id}"
                   f"{' (ANOMALY: ' + anomaly + ')' if anomaly else ''}")
         else:
-            print(f"[ERROR] Event failed for {agent.agent_id}")
+            log.error(f"[ERROR] Event failed for {agent.agent_id}")
 
-        time.sleep(_sleep_interval())
+        if stop_event.wait(_sleep_interval()):
+            break
 
-    print(f"🛑 Stopped agent simulation: {agent.agent_id}")
+    log.info(f"🛑 Stopped agent simulation: {agent.agent_id}")
 
 
-def simulate_single_cycle(agents: List[AgentProfile]):
+def simulate_shard(agents: List[AgentProfile]):
     """
-    Single-threaded mode: iterate agents sequentially each cycle.
+    Per-agent mode worker. Runs simulate_agent when it owns one agent, else
+    steps through its agents each cycle like single-thread mode.
     """
-    print("🚀 Starting network simulation (single-thread mode)...")
+    if len(agents) == 1:
+        simulate_agent(agents[0])
+        return
+    names = ", ".join(agent.agent_id for agent in agents)
+    log.info(f"🛰️  Starting agent simulation: {names}")
     while not stop_event.is_set():
         for agent in agents:
             if stop_event.is_set():
                 break
             metrics = generate_metrics(agent)
             metrics, anomaly = maybe_inject_anomaly(agent, metrics)
+            ok_report, ok_event = send_tick(agent, metrics)
+            if ok_report and ok_event:
+                log.info(f"[{now_strs()[1]}] Report and event sent for {agent.agent_id}"
+                      f"{' (ANOMALY: ' + anomaly + ')' if anomaly else ''}")
+            else:
+                log.error(f"[ERROR] Send failed for {agent.agent_id} (report={ok_report}, event={ok_event})")
+        if stop_event.wait(_sleep_interval()):
+            break
+    log.info(f"🛑 Stopped agent simulation: {names}")
+
+
+def simulate_single_cycle(agents: List[AgentProfile]):
+    """
+    Single-threaded mode: iterate agents sequentially each cycle. With NumPy,
+    the whole cycle's metrics are drawn up front by MetricsBatch.
+    """
+    log.info("🚀 Starting network simulation (single-thread mode)...")
+    batch = MetricsBatch(agents, SETTINGS.SEED) if np is not None and agents else None
+    while not stop_event.is_set():
+        cycle = batch.generate() if batch is not None else [generate_metrics(agent) for agent in agents]
+        for agent, metrics in zip(agents, cycle):
+            if stop_event.is_set():
+                break
+            metrics, anomaly = maybe_inject_anomaly(agent, metrics)
 
-            report_payload = build_report_payload(agent, metrics)
-            safe_post_json(SETTINGS.DASHBOARD_URL, report_payload)
-            event_payload = build_event_payload(agent, metrics)
-            safe_post_json(SETTINGS.EVENT_URL, event_payload)
+            send_tick(agent, metrics)
 
-            print(f"[{time.strftime('%H:%M:%S')}] Cycle complete for {agent.agent_id}"
+            log.info(f"[{now_strs()[1]}] Cycle complete for {agent.agent_id}"
                   f"{' (ANOMALY: ' + anomaly + ')' if anomaly else ''}")
 
-        print("--- Cycle Complete ---")
-        time.sleep(_sleep_interval())
-    print("🛑 Simulation stopped (single-thread mode).")
+        log.info("--- Cycle Complete ---")
+        if stop_event.wait(_sleep_interval()):
+            break
+    log.info("🛑 Simulation stopped (single-thread mode).")
+
+
+# ----------------------------
+# asyncio mode
+# ----------------------------
+
+# Completes once stop_event is set; created by simulate_asyncio
+_stop_waiter: Optional[asyncio.Future] = None
+
+
+async def wait_stop_async(timeout: float) -> bool:
+    """stop_event.wait(timeout) for the asyncio mode: returns early on stop."""
+    await asyncio.wait((_stop_waiter,), timeout=timeout)
+    return stop_event.is_set()
+
+
+async def safe_post_json_async(http, url: str, body: bytes, raise_not_found: bool = False) -> bool:
+    """safe_post_json on a shared httpx.AsyncClient."""
+    for attempt in range(1, SETTINGS.MAX_RETRIES + 1):
+        try:
+            resp = await http.post(url, content=body)
+            if raise_not_found and resp.status_code == 404:
+                raise EndpointNotFound(url)
+            resp.raise_for_status()
+            return True
+        except EndpointNotFound:
+            raise
+        except Exception as e:
+            backoff = min(SETTINGS.BACKOFF_BASE * (2 ** (attempt - 1)), SETTINGS.BACKOFF_MAX)
+            if SETTINGS.JITTER:
+                backoff += _rng().uniform(0, SETTINGS.JITTER_MAX_MS / 1000.0)
+            log.warning(f"[WARN] POST attempt {attempt} to {url} failed: {e}. Retrying in {backoff:.2f}s")
+            if await wait_stop_async(backoff):
+                break
+    return False
+
+
+async def send_tick_async(http, agent: AgentProfile, metrics: Dict) -> Tuple[bool, bool]:
+    global _telemetry_supported
+    if SETTINGS.TELEMETRY_URL and _telemetry_supported:
+        try:
+            body = build_combined_payload(agent, metrics)
+            ok = await safe_post_json_async(http, SETTINGS.TELEMETRY_URL, body, raise_not_found=True)
+            return ok, ok
+        except EndpointNotFound:
+            if _telemetry_supported:
+                log.warning(f"[WARN] {SETTINGS.TELEMETRY_URL} not found; sending reports and events separately")
+            _telemetry_supported = False
+    ok_report, ok_event = await asyncio.gather(
+        safe_post_json_async(http, SETTINGS.DASHBOARD_URL, build_report_payload(agent, metrics)),
+        safe_post_json_async(http, SETTINGS.EVENT_URL, build_event_payload(agent, metrics)),
+    )
+    return ok_report, ok_event
+
+
+async def simulate_agent_async(agent: AgentProfile, http) -> None:
+    log.info(f"🛰️  Starting agent simulation: {agent.agent_id}")
+    while not stop_event.is_set():
+        metrics = generate_metrics(agent)
+        metrics, anomaly = maybe_inject_anomaly(agent, metrics)
+        ok_report, ok_event = await send_tick_async(http, agent, metrics)
+        if ok_report and ok_event:
+            log.info(f"[{now_strs()[1]}] Report and event sent for {agent.agent_id}"
+                  f"{' (ANOMALY: ' + anomaly + ')' if anomaly else ''}")
+        else:
+            log.error(f"[ERROR] Send failed for {agent.agent_id} (report={ok_report}, event={ok_event})")
+        await wait_stop_async(_sleep_interval())
+    log.info(f"🛑 Stopped agent simulation: {agent.agent_id}")
+
+
+async def simulate_asyncio(agents: List[AgentProfile]) -> None:
+    """
+    All agents as tasks on one event loop sharing one pooled client, so agent
+    count is not bounded by threads.
+    """
+    global _stop_waiter
+    # One helper thread blocks on stop_event so tasks can wait on it too
+    _stop_waiter = asyncio.ensure_future(asyncio.to_thread(stop_event.wait))
+    try:
+        await run_agents_async(agents)
+    finally:
+        stop_event.set()  # releases the helper thread
+        await _stop_waiter
+    log.info("✅ Simulation stopped.")
+
+
+async def run_agents_async(agents: List[AgentProfile]) -> None:
+    async with httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(**transport_options(len(agents))),
+        timeout=SETTINGS.TIMEOUT,
+        headers=_JSON_HEADERS,
+        trust_env=False,
+    ) as http:
+        log.info("🚀 Simulation started (asyncio). Press Ctrl+C to stop.")
+        await asyncio.gather(*(simulate_agent_async(agent, http) for agent in agents))
 
 
 # ----------------------------
@@ -366,7 +799,7 @@ def simulate_single_cycle(agents: List[AgentProfile]):
 # ----------------------------
 
 def handle_signal(signum, frame):
-    print(f"\n[INFO] Received signal {signum}, stopping simulation...")
+    log.info(f"Received signal {signum}, stopping simulation...")
     stop_event.set()
 
 
@@ -374,6 +807,8 @@ def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Adaptive Network Simulator")
     p.add_argument("--dashboard-url", default=SETTINGS.DASHBOARD_URL, help="Report endpoint URL")
     p.add_argument("--event-url", default=SETTINGS.EVENT_URL, help="Event endpoint URL")
+    p.add_argument("--telemetry-url", default=SETTINGS.TELEMETRY_URL,
+                   help="Combined report+event endpoint URL ('' to always send separately)")
     p.add_argument("--interval", type=float, default=SETTINGS.INTERVAL, help="Seconds between sends")
     p.add_argument("--timeout", type=float, default=SETTINGS.TIMEOUT, help="HTTP request timeout (s)")
     p.add_argument("--verify-tls", type=str, default=str(SETTINGS.VERIFY_TLS).lower(),
@@ -381,8 +816,10 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--max-retries", type=int, default=SETTINGS.MAX_RETRIES, help="Max HTTP retries")
     p.add_argument("--backoff-base", type=float, default=SETTINGS.BACKOFF_BASE, help="Backoff base seconds")
     p.add_argument("--backoff-max", type=float, default=SETTINGS.BACKOFF_MAX, help="Backoff max seconds")
-    p.add_argument("--concurrency", default=SETTINGS.CONCURRENCY, choices=["per-agent", "single"],
-                   help="per-agent threads or single-thread loop")
+    p.add_argument("--concurrency", default=SETTINGS.CONCURRENCY, choices=["per-agent", "single", "asyncio"],
+                   help="per-agent threads, single-thread loop or one asyncio loop for all agents")
+    p.add_argument("--workers", type=int, default=SETTINGS.WORKERS,
+                   help="Max threads in per-agent mode; agents beyond that share threads")
     p.add_argument("--jitter", type=str, default=str(SETTINGS.JITTER).lower(), choices=["true", "false"],
                    help="Enable random jitter (+/-) around interval")
     p.add_argument("--jitter-max-ms", type=int, default=SETTINGS.JITTER_MAX_MS, help="Max jitter in ms")
@@ -394,21 +831,26 @@ def parse_args() -> argparse.Namespace:
 
 
 def apply_overrides(args: argparse.Namespace):
-    SETTINGS.DASHBOARD_URL = args.dashboard_url
-    SETTINGS.EVENT_URL = args.event_url
-    SETTINGS.INTERVAL = args.interval
-    SETTINGS.TIMEOUT = args.timeout
-    SETTINGS.VERIFY_TLS = args.verify_tls == "true"
-    SETTINGS.MAX_RETRIES = args.max_retries
-    SETTINGS.BACKOFF_BASE = args.backoff_base
-    SETTINGS.BACKOFF_MAX = args.backoff_max
-    SETTINGS.CONCURRENCY = args.concurrency
-    SETTINGS.JITTER = args.jitter == "true"
-    SETTINGS.JITTER_MAX_MS = args.jitter_max_ms
-    SETTINGS.ANOMALY_RATE = args.anomaly_rate
-    if args.seed is not None:
-        SETTINGS.SEED = args.seed
-        random.seed(args.seed)
+    """Replaces SETTINGS with a copy carrying the CLI values (Settings is frozen)."""
+    global SETTINGS
+    SETTINGS = replace(
+        SETTINGS,
+        DASHBOARD_URL=args.dashboard_url,
+        EVENT_URL=args.event_url,
+        TELEMETRY_URL=args.telemetry_url,
+        INTERVAL=args.interval,
+        TIMEOUT=args.timeout,
+        VERIFY_TLS=args.verify_tls == "true",
+        MAX_RETRIES=args.max_retries,
+        BACKOFF_BASE=args.backoff_base,
+        BACKOFF_MAX=args.backoff_max,
+        CONCURRENCY=args.concurrency,
+        WORKERS=args.workers,
+        JITTER=args.jitter == "true",
+        JITTER_MAX_MS=args.jitter_max_ms,
+        ANOMALY_RATE=args.anomaly_rate,
+        SEED=args.seed if args.seed is not None else SETTINGS.SEED,
+    )
 
 
 def main():
@@ -419,32 +861,64 @@ def main():
     signal.signal(signal.SIGINT, handle_signal)
     signal.signal(signal.SIGTERM, handle_signal)
 
-    agents = load_agents()
+    try:
+        run_simulation(load_agents())
+    finally:
+        close_session()
+        log_listener.stop()  # drains queued records before exit
 
-    if SETTINGS.CONCURRENCY == "per-agent":
-        threads: List[threading.Thread] = []
-        for agent in agents:
-            t = threading.Thread(target=simulate_agent, args=(agent,), daemon=True, name=f"sim-{agent.agent_id}")
-            t.start()
-            threads.append(t)
 
-        print("🚀 Simulation started (per-agent threads). Press Ctrl+C to stop.")
+def run_simulation(agents: List[AgentProfile]):
+    if SETTINGS.CONCURRENCY != "asyncio":  # asyncio mode opens its own AsyncClient
+        configure_session(len(agents))
+
+    if SETTINGS.CONCURRENCY == "per-agent":
+        # One thread per agent up to WORKERS; past that, agents are dealt
+        # round-robin so each worker owns a fixed shard
+        workers = max(1, min(SETTINGS.WORKERS, len(agents)))
+        shards = [agents[i::workers] for i in range(workers)]
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sim")
+        futures = [pool.submit(simulate_shard, shard) for shard in shards]
+        # Workers that all exit on their own (e.g. crashed) end the run too,
+        # so the main thread can block on stop_event without polling
+        remaining = [len(futures)]
+        remaining_lock = threading.Lock()
+
+        def worker_done(future) -> None:
+            exc = None if future.cancelled() else future.exception()
+            if exc is not None:
+                log.error(f"[ERROR] Simulation worker crashed: {exc!r}", exc_info=exc)
+            with remaining_lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    stop_event.set()
+
+        for f in futures:
+            f.add_done_callback(worker_done)
+
+        log.info(f"🚀 Simulation started ({workers} agent threads). Press Ctrl+C to stop.")
         try:
-            while any(t.is_alive() for t in threads):
-                time.sleep(0.5)
+            stop_event.wait()
         except KeyboardInterrupt:
             pass
         finally:
             stop_event.set()
-            for t in threads:
-                t.join(timeout=2.0)
-            print("✅ Simulation stopped.")
+            # Workers wait on stop_event between sends, so this returns
+            # within one in-flight request
+            pool.shutdown(wait=True)
+            log.info("✅ Simulation stopped.")
+    elif SETTINGS.CONCURRENCY == "asyncio":
+        try:
+            asyncio.run(simulate_asyncio(agents))
+        except KeyboardInterrupt:
+            stop_event.set()
+            log.info("✅ Simulation stopped.")
     else:
         try:
             simulate_single_cycle(agents)
         except KeyboardInterrupt:
             stop_event.set()
-            print("✅ Simulation stopped.")
+            log.info("✅ Simulation stopped.")
 
 
 if __name__ == "__main__":